@@ -27,6 +27,7 @@ class LiveKitSalonAgent:
         )
         
         self.current_customer_phone = None
+        self.caller_history = []
         self.conversation_history = []
     
     async def handle_call(self, ctx: JobContext):
@@ -34,11 +35,21 @@ class LiveKitSalonAgent:
         logger.info("📞 LiveKit: Incoming call received")
         
         try:
-            await ctx.connect()
-            
             # Simulate customer phone number
             self.current_customer_phone = "+15551234567"
             
+            # Look up the caller's earlier requests while the room connects
+            history_task = asyncio.create_task(
+                self.help_service.get_requests_for_customer(self.current_customer_phone, limit=5)
+            )
+            await ctx.connect()
+            try:
+                self.caller_history = await history_task
+                if self.caller_history:
+                    logger.info(f"📞 LiveKit: Caller has {len(self.caller_history)} earlier help requests")
+            except Exception as e:
+                logger.warning(f"📞 LiveKit: Could not load caller history: {e}")
+            
             @ctx.room.on("participant_connected")
             def on_participant_connected(participant):
                 if participant.identity == "caller":
@@ -59,6 +70,7 @@ class LiveKitSalonAgent:
         finally:
             logger.info("📞 LiveKit: Call ended")
             self.current_customer_phone = None
+            self.caller_history = []
             self.conversation_history = []
     
     async def _start_conversation(self, ctx: JobContext):
@@ -108,6 +120,11 @@ class LiveKitSalonAgent:
                 context="LiveKit Voice Call - AI couldn't answer"
             )
             
+            if help_request.joined:
+                # Same question is already with the supervisor; this caller gets the answer too
+                logger.info(f"🆘 LiveKit: Caller joined open help request: {help_request.id}")
+                return
+            
             # Notify supervisor
             self._notify_supervisor(help_request)
             
@@ -131,20 +148,22 @@ class LiveKitSalonAgent:
             if help_request:
                 await self.kb_service.add_entry(help_request.question, answer, "supervisor")
                 
-                # Simulate texting customer back
-                self._notify_customer(help_request, answer)
+                # Simulate texting back everyone who asked the same question
+                subscribers = await self.help_service.get_subscribers(request_id)
+                for phone in [help_request.customer_phone] + sorted(set(subscribers) - {help_request.customer_phone}):
+                    self._notify_customer(help_request, answer, phone)
                 
                 logger.info(f"✅ LiveKit: Processed supervisor response for request {request_id}")
             
         except Exception as e:
             logger.error(f"📞 LiveKit: Error handling supervisor response: {e}")
     
-    def _notify_customer(self, help_request, answer: str):
+    def _notify_customer(self, help_request, answer: str, phone: str = None):
         """Simulate texting customer back with the answer"""
         message = f"Hi! Following up on your question about '{help_request.question}'. Here's the answer: {answer}"
         print(f"\n{'='*60}")
         print("📱 SIMULATED SMS TO CUSTOMER:")
-        print(f"To: {help_request.customer_phone}")
+        print(f"To: {phone or help_request.customer_phone}")
         print(f"Message: {message}")
         print(f"{'='*60}\n")
 
@@ -9,10 +9,11 @@ from config import Config
 logger = logging.getLogger(__name__)
 
 class SimpleGroqAgent:
-    def __init__(self):
-        self.kb_service = KnowledgeBaseService()
-        self.help_service = HelpRequestService()
-        self.client = groq.AsyncGroq(api_key=Config.GROQ_API_KEY)
+    def __init__(self, help_service: HelpRequestService = None, kb_service: KnowledgeBaseService = None, client=None):
+        # Services and the Groq client can be shared; the conversation below belongs to this agent
+        self.kb_service = kb_service or KnowledgeBaseService()
+        self.help_service = help_service or HelpRequestService()
+        self.client = client or groq.AsyncGroq(api_key=Config.GROQ_API_KEY)
         self.conversation_history = [
             {'role': 'system', 'content': SALON_BASE_PROMPT}
         ]
@@ -24,15 +25,18 @@ class SimpleGroqAgent:
         logger.info(f'Creating help request for all questions: {user_message}')
         await self._create_help_request(user_message, customer_phone)
         
-        # Only use knowledge base for exact or very close matches
+        # Exact question first, then the closest fuzzy match above the threshold
         kb_answer = await self.kb_service.find_answer(user_message)
         if kb_answer:
-            # Only return KB answer if it's a good match
-            if self._is_good_match(user_message, kb_answer):
-                logger.info(f'Found good answer in knowledge base: {kb_answer}')
-                return kb_answer
-            else:
-                logger.info('KB answer found but not a good match - letting AI handle it')
+            logger.info(f'Found exact answer in knowledge base: {kb_answer}')
+            return kb_answer
+        
+        matches = await self.kb_service.find_best_answers(user_message, k=1, min_score=Config.KB_MATCH_MIN_SCORE)
+        if matches:
+            entry, score = matches[0]
+            await self.kb_service.record_usage(entry.id)
+            logger.info(f'Found close match in knowledge base ({score:.2f}): {entry.answer}')
+            return entry.answer
         
         self.conversation_history.append({'role': 'user', 'content': user_message})
         
@@ -90,6 +94,9 @@ class SimpleGroqAgent:
                 context='Automatic help request for all customer questions'
             )
             
+            if help_request.joined:
+                logger.info(f'Customer joined open help request: {help_request.id}')
+                return
             self._notify_supervisor(help_request)
             
             logger.info(f'Help request created for ALL questions: {help_request.id}')
@@ -97,22 +104,6 @@ class SimpleGroqAgent:
         except Exception as e:
             logger.error(f'Error creating help request: {e}')
     
-    def _is_good_match(self, question: str, answer: str) -> bool:
-        # Only use KB for very specific, exact matches
-        question_lower = question.lower()
-        
-        # List of questions that should definitely use KB
-        exact_matches = [
-            'what are your hours',
-            'do you take walk ins', 
-            'what services do you offer',
-            'where are you located',
-            'what is your phone number',
-            'what is your address'
-        ]
-        
-        return any(exact_q in question_lower for exact_q in exact_matches)
-    
     async def _escalate_to_supervisor(self, question: str, customer_phone: str):
         try:
             help_request = await self.help_service.create_help_request(
@@ -121,6 +112,9 @@ class SimpleGroqAgent:
                 context='AI could not answer the question'
             )
             
+            if help_request.joined:
+                logger.info(f'Customer joined open help request: {help_request.id}')
+                return
             self._notify_supervisor(help_request)
             
             logger.info(f'Help request created: {help_request.id}')
@@ -141,18 +135,49 @@ class SimpleGroqAgent:
             if help_request:
                 await self.kb_service.add_entry(help_request.question, answer, 'supervisor')
                 
-                self._notify_customer(help_request, answer)
+                # Everyone who asked the same question gets the answer
+                help_request.subscribers = await self.help_service.get_subscribers(request_id)
+                for phone in self._recipients(help_request):
+                    self._notify_customer(help_request, answer, phone)
                 
                 logger.info(f'Processed supervisor response for request {request_id}')
             
         except Exception as e:
             logger.error(f'Error handling supervisor response: {e}')
     
-    def _notify_customer(self, help_request, answer: str):
+    async def handle_batch_response(self, help_requests, answer: str):
+        """Follow up on requests resolved together by resolve_many (subscribers already loaded)."""
+        try:
+            questions = list(dict.fromkeys(help_request.question for help_request in help_requests))
+            await self.kb_service.add_entries(((question, answer) for question in questions), source='supervisor')
+            
+            self._notify_customers([
+                (phone, help_request)
+                for help_request in help_requests
+                for phone in self._recipients(help_request)
+            ], answer)
+            
+            logger.info(f'Processed supervisor response for {len(help_requests)} requests')
+        
+        except Exception as e:
+            logger.error(f'Error handling batch supervisor response: {e}')
+    
+    @staticmethod
+    def _recipients(help_request):
+        return [help_request.customer_phone] + sorted(set(help_request.subscribers) - {help_request.customer_phone})
+    
+    def _notify_customers(self, recipients, answer: str):
+        print(f'\n{"="*60}')
+        print(f'SIMULATED SMS BATCH TO {len(recipients)} CUSTOMERS:')
+        for phone, help_request in recipients:
+            print(f"To: {phone} | Message: Hi! Following up on your question about '{help_request.question}'. Here's the answer: {answer}")
+        print(f'{"="*60}\n')
+    
+    def _notify_customer(self, help_request, answer: str, phone: str = None):
         message = f"Hi! Following up on your question about '{help_request.question}'. Here's the answer: {answer}"
         print(f'\n{"="*60}')
         print('SIMULATED SMS TO CUSTOMER:')
-        print(f'To: {help_request.customer_phone}')
+        print(f'To: {phone or help_request.customer_phone}')
         print(f'Message: {message}')
         print(f'{"="*60}\n')
 
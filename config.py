@@ -17,9 +17,64 @@ class Config:
     
     # Redis Configuration
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379')
+    # Shared connection pool (see redis_pool.py)
+    REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', '50'))
+    REDIS_POOL_TIMEOUT_SECONDS = float(os.getenv('REDIS_POOL_TIMEOUT_SECONDS', '5'))
+    # Also bounds blocking reads (XREAD/XREADGROUP BLOCK, pub/sub waits): their
+    # block_ms must stay below it or every idle read fails with a timeout
+    REDIS_SOCKET_TIMEOUT_SECONDS = float(os.getenv('REDIS_SOCKET_TIMEOUT_SECONDS', '5'))
+    REDIS_HEALTH_CHECK_SECONDS = int(os.getenv('REDIS_HEALTH_CHECK_SECONDS', '30'))
     
     # Supervisor Configuration
     SUPERVISOR_PHONE = os.getenv('SUPERVISOR_PHONE', '+1234567890')
     
     # Application Configuration
-    REQUEST_TIMEOUT_MINUTES = int(os.getenv('REQUEST_TIMEOUT_MINUTES', '60'))
\ No newline at end of file
+    REQUEST_TIMEOUT_MINUTES = int(os.getenv('REQUEST_TIMEOUT_MINUTES', '60'))
+    
+    # Knowledge Base Cache (0 disables the in-process cache)
+    KB_CACHE_SIZE = int(os.getenv('KB_CACHE_SIZE', '1024'))
+    KB_CACHE_TTL_SECONDS = int(os.getenv('KB_CACHE_TTL_SECONDS', '300'))
+    
+    # How often buffered knowledge base usage counters are written to Redis
+    KB_USAGE_FLUSH_SECONDS = float(os.getenv('KB_USAGE_FLUSH_SECONDS', '5'))
+    
+    # Minimum similarity score for a fuzzy knowledge base match to be used
+    KB_MATCH_MIN_SCORE = float(os.getenv('KB_MATCH_MIN_SCORE', '0.6'))
+    
+    # How often the background sweeper moves overdue help requests to TIMEOUT
+    HELP_REQUEST_SWEEP_SECONDS = float(os.getenv('HELP_REQUEST_SWEEP_SECONDS', '15'))
+    
+    # SQLite archive for help request history (empty disables archiving);
+    # requests resolved more than ARCHIVE_AFTER_MINUTES ago move there
+    ARCHIVE_DB_PATH = os.getenv('ARCHIVE_DB_PATH', 'data/archive.db')
+    ARCHIVE_AFTER_MINUTES = float(os.getenv('ARCHIVE_AFTER_MINUTES', '15'))
+    ARCHIVE_INTERVAL_SECONDS = float(os.getenv('ARCHIVE_INTERVAL_SECONDS', '60'))
+    
+    # How long a SQLite write waits for another process's lock before failing;
+    # every UI worker, the agent and the sweeper open the same files
+    SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv('SQLITE_BUSY_TIMEOUT_SECONDS', '30'))
+    
+    # SQLite full-text index over help requests and knowledge entries (empty disables search)
+    SEARCH_DB_PATH = os.getenv('SEARCH_DB_PATH', 'data/search.db')
+    
+    # Supervisor UI rendered-page cache (0 disables it) and how long a data
+    # version read is reused before asking Redis again
+    PAGE_CACHE_SIZE = int(os.getenv('PAGE_CACHE_SIZE', '256'))
+    PAGE_VERSION_TTL_SECONDS = float(os.getenv('PAGE_VERSION_TTL_SECONDS', '1'))
+    
+    # Supervisor UI server. main.py runs the single-process development server
+    # unless SUPERVISOR_UI_EMBEDDED is false; gunicorn.conf.py reads the rest.
+    SUPERVISOR_UI_HOST = os.getenv('SUPERVISOR_UI_HOST', '0.0.0.0')
+    SUPERVISOR_UI_PORT = int(os.getenv('SUPERVISOR_UI_PORT', '5000'))
+    SUPERVISOR_UI_EMBEDDED = os.getenv('SUPERVISOR_UI_EMBEDDED', 'true').lower() in ('1', 'true', 'yes')
+    # 0 means one worker per CPU core
+    SUPERVISOR_UI_WORKERS = int(os.getenv('SUPERVISOR_UI_WORKERS', '0'))
+    # Threads per worker; each open /events stream keeps one busy
+    SUPERVISOR_UI_THREADS = int(os.getenv('SUPERVISOR_UI_THREADS', '16'))
+    # Open /events streams allowed per worker (further ones get a 503), and
+    # how long one stays open before the browser is made to reconnect
+    SUPERVISOR_UI_MAX_STREAMS = int(os.getenv('SUPERVISOR_UI_MAX_STREAMS', str(max(1, SUPERVISOR_UI_THREADS // 2))))
+    EVENTS_MAX_STREAM_SECONDS = float(os.getenv('EVENTS_MAX_STREAM_SECONDS', '300'))
+    
+    # Approximate number of lifecycle events kept in help_requests:events
+    HELP_REQUEST_EVENTS_MAXLEN = int(os.getenv('HELP_REQUEST_EVENTS_MAXLEN', '100000'))
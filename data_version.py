@@ -0,0 +1,34 @@
+"""
+Change counters for the data shown in the supervisor UI.
+
+Every write path bumps the version of the data it changed in the same
+pipeline as the write, so a reader that sees an unchanged version knows
+nothing it rendered is stale. The UI turns the versions into ETag and
+Last-Modified headers and keys its rendered-page cache on them.
+"""
+
+import time
+from typing import Dict
+
+VERSION_KEY = "data:version"
+
+# Scopes
+HELP_REQUESTS = "help_requests"
+KNOWLEDGE = "knowledge"
+
+
+def queue_bump(pipe, *scopes: str):
+    """Queue the version bump for ``scopes`` on a (sync or async) pipeline."""
+    now = time.time()
+    for scope in scopes:
+        pipe.hincrby(VERSION_KEY, scope, 1)
+        pipe.hset(VERSION_KEY, f"{scope}:at", now)
+
+
+async def read_versions(redis) -> Dict[str, dict]:
+    """``{scope: {"version": int, "at": epoch}}`` for every scope, in one round trip."""
+    data = await redis.hgetall(VERSION_KEY)
+    return {
+        scope: {"version": int(data.get(scope, 0)), "at": float(data.get(f"{scope}:at", 0))}
+        for scope in (HELP_REQUESTS, KNOWLEDGE)
+    }
@@ -0,0 +1,26 @@
+"""
+Gunicorn settings for the supervisor UI (``gunicorn -c gunicorn.conf.py supervisor_ui.wsgi:app``).
+
+Workers are separate processes, so throughput scales with cores; threads
+within a worker overlap the time views spend waiting on Redis. Each worker
+opens up to REDIS_MAX_CONNECTIONS connections, so size Redis' maxclients for
+workers x REDIS_MAX_CONNECTIONS. Run ``main.py`` with
+SUPERVISOR_UI_EMBEDDED=false next to it for the sweepers and the agent.
+
+Every open dashboard holds one thread for its /events stream, so a worker
+serves at most SUPERVISOR_UI_MAX_STREAMS streams (half its threads by
+default) and answers the rest with 503. Raise SUPERVISOR_UI_THREADS along
+with it when many supervisors keep the dashboard open.
+"""
+
+import multiprocessing
+
+from config import Config
+
+bind = f"{Config.SUPERVISOR_UI_HOST}:{Config.SUPERVISOR_UI_PORT}"
+workers = Config.SUPERVISOR_UI_WORKERS or multiprocessing.cpu_count()
+# Threaded workers: an open /events stream holds a thread, not a whole process
+worker_class = "gthread"
+threads = Config.SUPERVISOR_UI_THREADS
+# Build the app in each worker rather than in the master and fork it
+preload_app = False
@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from .models import HelpRequest, RequestStatus, normalize_phone
+from config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS help_requests (
+    id TEXT PRIMARY KEY,
+    customer_phone TEXT NOT NULL,
+    question TEXT NOT NULL,
+    context TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    resolved_at REAL NOT NULL,
+    supervisor_answer TEXT,
+    timeout_minutes INTEGER,
+    customer_key TEXT NOT NULL DEFAULT ''  -- normalize_phone(customer_phone)
+);
+CREATE INDEX IF NOT EXISTS idx_help_requests_resolved_at ON help_requests (resolved_at);
+CREATE INDEX IF NOT EXISTS idx_help_requests_customer_phone ON help_requests (customer_phone, resolved_at);
+CREATE INDEX IF NOT EXISTS idx_help_requests_status ON help_requests (status, resolved_at);
+CREATE INDEX IF NOT EXISTS idx_help_requests_customer_key ON help_requests (customer_key, created_at);
+"""
+
+COLUMNS = "id, customer_phone, question, context, status, created_at, resolved_at, supervisor_answer, timeout_minutes"
+
+
+class HelpRequestArchive:
+    """SQLite store for help requests that reached a terminal status.
+
+    Redis only keeps requests for REQUEST_TIMEOUT_MINUTES; the archiver moves
+    them here before they expire. ``resolved_at`` is stored as a UTC epoch so
+    it lines up with the scores of help_requests:resolved.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=Config.SQLITE_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def store(self, requests: Iterable[HelpRequest]) -> int:
+        """Insert or replace a batch of requests in one transaction."""
+        rows = [self._to_row(help_request) for help_request in requests]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO help_requests ({COLUMNS}, customer_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def get(self, request_id: str) -> Optional[HelpRequest]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {COLUMNS} FROM help_requests WHERE id = ?", (request_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def list_resolved(
+        self,
+        before: float,
+        since: Optional[float] = None,
+        limit: int = 20,
+        before_id: Optional[str] = None,
+    ) -> List[Tuple[HelpRequest, float]]:
+        """Requests resolved before ``before`` (exclusive), newest first, with their resolved_at epoch.
+
+        With ``before_id`` the bound is the position ``(before, before_id)``
+        instead, so requests resolved at exactly ``before`` with a smaller id
+        are included. Ties are ordered by id, descending, like a Redis ZREVRANGE.
+        """
+        if before_id is None:
+            query = f"SELECT {COLUMNS} FROM help_requests WHERE resolved_at < ?"
+            params = [before]
+        else:
+            query = f"SELECT {COLUMNS} FROM help_requests WHERE (resolved_at < ? OR (resolved_at = ? AND id < ?))"
+            params = [before, before, before_id]
+        if since is not None:
+            query += " AND resolved_at >= ?"
+            params.append(since)
+        query += " ORDER BY resolved_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [(self._from_row(row), row[6]) for row in rows]
+
+    def list_for_customer(self, customer_key: str, limit: int = 10) -> List[HelpRequest]:
+        """A customer's requests by normalized phone, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {COLUMNS} FROM help_requests WHERE customer_key = ? ORDER BY created_at DESC LIMIT ?",
+                (customer_key, limit)
+            ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_row(help_request: HelpRequest) -> tuple:
+        resolved_at = help_request.resolved_at or help_request.created_at
+        if resolved_at.tzinfo is None:
+            resolved_at = resolved_at.replace(tzinfo=timezone.utc)
+        return (
+            help_request.id,
+            help_request.customer_phone,
+            help_request.question,
+            help_request.context,
+            help_request.status.value,
+            help_request.created_at.isoformat(),
+            resolved_at.timestamp(),
+            help_request.supervisor_answer,
+            help_request.timeout_minutes,
+            normalize_phone(help_request.customer_phone),
+        )
+
+    @staticmethod
+    def _from_row(row) -> HelpRequest:
+        return HelpRequest(
+            id=row[0],
+            customer_phone=row[1],
+            question=row[2],
+            context=row[3] or '',
+            status=RequestStatus(row[4]),
+            created_at=datetime.fromisoformat(row[5]),
+            resolved_at=datetime.fromtimestamp(row[6], timezone.utc).replace(tzinfo=None),
+            supervisor_answer=row[7],
+            timeout_minutes=row[8] or 60,
+        )
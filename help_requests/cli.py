@@ -0,0 +1,67 @@
+"""
+Maintenance commands for help requests.
+
+    python -m help_requests.cli build-index
+    python -m help_requests.cli migrate-pending
+    python -m help_requests.cli archive
+"""
+
+import argparse
+import asyncio
+import logging
+
+from .service import HelpRequestService
+
+logger = logging.getLogger(__name__)
+
+
+async def build_index(args):
+    help_service = HelpRequestService()
+    count = await help_service.rebuild_indexes(batch_size=args.batch_size)
+    print(f"Indexed {count} resolved help requests")
+
+
+async def migrate_pending(args):
+    help_service = HelpRequestService()
+    count = await help_service.migrate_pending_list()
+    print(f"Migrated {count} pending help requests")
+
+
+async def archive(args):
+    help_service = HelpRequestService()
+    if help_service.archive is None:
+        print("Archiving is disabled (ARCHIVE_DB_PATH is empty)")
+        return
+    count = await help_service.archive_resolved(older_than_minutes=args.older_than, batch_size=args.batch_size)
+    print(f"Archived {count} help requests to {help_service.archive.path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Help request maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser(
+        "build-index", help="Build the lookup indexes for existing help_request:* documents"
+    )
+    index_parser.add_argument("--batch-size", type=int, default=500)
+    index_parser.set_defaults(handler=build_index)
+
+    migrate_parser = subparsers.add_parser(
+        "migrate-pending", help="Move the legacy help_requests:pending list into the sorted pending queue"
+    )
+    migrate_parser.set_defaults(handler=migrate_pending)
+
+    archive_parser = subparsers.add_parser(
+        "archive", help="Move resolved help requests from Redis into the SQLite archive now"
+    )
+    archive_parser.add_argument("--older-than", type=float, default=None, help="Minutes since resolution (default ARCHIVE_AFTER_MINUTES)")
+    archive_parser.add_argument("--batch-size", type=int, default=500)
+    archive_parser.set_defaults(handler=archive)
+
+    args = parser.parse_args(argv)
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import socket
+import uuid
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from config import Config
+from redis_pool import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Append-only log of help request state changes, written by HelpRequestService
+EVENTS_STREAM = 'help_requests:events'
+
+# Event types; the terminal ones match the RequestStatus values
+CREATED = 'created'
+RESOLVED = 'resolved'
+UNRESOLVED = 'unresolved'
+TIMEOUT = 'timeout'
+
+
+def event_fields(event_type: str, help_request) -> dict:
+    """Stream entry fields for a transition of ``help_request``."""
+    return {
+        'type': event_type,
+        'request_id': help_request.id,
+        'status': help_request.status.value,
+        'customer_phone': help_request.customer_phone,
+        'question': help_request.question,
+        'supervisor_answer': help_request.supervisor_answer or '',
+        'at': (help_request.resolved_at or help_request.created_at).isoformat(),
+    }
+
+
+async def read_events(after_id: str = '0', count: int = 100, redis_url: str = None) -> List[Tuple[str, dict]]:
+    """Replay up to ``count`` events logged after ``after_id`` (exclusive).
+
+    Returns ``(event_id, fields)`` pairs, oldest first; pass the last id
+    back in to continue.
+    """
+    redis = get_async_redis(redis_url)
+    start = f'({after_id}' if after_id != '0' else '-'
+    return await redis.xrange(EVENTS_STREAM, min=start, max='+', count=count)
+
+
+class EventConsumer:
+    """Consumer-group reader over the help request event stream.
+
+    Every group sees every event; consumers that share a group split the
+    events between them. An event is acknowledged only after ``handler``
+    returns, so delivery is at-least-once: events left unacknowledged by a
+    crashed consumer are reclaimed after ``claim_idle_ms``.
+    """
+
+    def __init__(
+        self,
+        group: str,
+        handler: Callable[[str, dict], Awaitable[None]],
+        consumer: Optional[str] = None,
+        start_id: str = '$',
+        batch_size: int = 50,
+        block_ms: int = 2000,
+        claim_idle_ms: int = 60000,
+        redis_url: str = None,
+    ):
+        self.group = group
+        self.handler = handler
+        self.consumer = consumer or f'{socket.gethostname()}-{uuid.uuid4().hex[:8]}'
+        # Where a new group starts reading: '$' for new events only, '0' for the whole log
+        self.start_id = start_id
+        self.batch_size = batch_size
+        # Bounded by REDIS_SOCKET_TIMEOUT_SECONDS (see config)
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.redis_url = redis_url or Config.REDIS_URL
+        self._task = None
+
+    @property
+    def redis(self):
+        return get_async_redis(self.redis_url)
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run(), name=f'help-request-events-{self.group}')
+        return self._task
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def ensure_group(self):
+        try:
+            await self.redis.xgroup_create(EVENTS_STREAM, self.group, id=self.start_id, mkstream=True)
+        except Exception as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    async def replay_from(self, event_id: str):
+        """Move the group's read position so events after ``event_id`` are delivered again."""
+        await self.ensure_group()
+        await self.redis.xgroup_setid(EVENTS_STREAM, self.group, event_id)
+
+    async def run(self):
+        await self.ensure_group()
+        while True:
+            try:
+                await self.process_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'Event consumer {self.group}/{self.consumer} failed, will retry: {e}')
+                await asyncio.sleep(1)
+
+    async def process_once(self) -> int:
+        """Handle one batch: stale events from dead consumers first, then new ones."""
+        claimed = await self.redis.xautoclaim(
+            EVENTS_STREAM, self.group, self.consumer,
+            min_idle_time=self.claim_idle_ms, start_id='0-0', count=self.batch_size
+        )
+        messages = [message for message in claimed[1] if message[1]]
+        if not messages:
+            response = await self.redis.xreadgroup(
+                self.group, self.consumer, {EVENTS_STREAM: '>'},
+                count=self.batch_size, block=self.block_ms
+            )
+            messages = response[0][1] if response else []
+
+        handled = 0
+        for event_id, fields in messages:
+            try:
+                await self.handler(event_id, fields)
+            except Exception as e:
+                # Left pending; reclaimed and retried after claim_idle_ms
+                logger.warning(f'Event {event_id} handler failed in {self.group}: {e}')
+                continue
+            await self.redis.xack(EVENTS_STREAM, self.group, event_id)
+            handled += 1
+        return handled
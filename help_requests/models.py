@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
+import html
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
+import re
 import uuid
 
 class RequestStatus(str, Enum):
@@ -9,6 +11,20 @@ class RequestStatus(str, Enum):
     UNRESOLVED = 'unresolved'
     TIMEOUT = 'timeout'
 
+# Statuses a request never leaves once it reaches them
+TERMINAL_STATUSES = (RequestStatus.RESOLVED, RequestStatus.UNRESOLVED, RequestStatus.TIMEOUT)
+
+class StatusConflict(ValueError):
+    """A status transition lost to a concurrent one (e.g. the request was already resolved)."""
+
+def normalize_phone(phone: str) -> str:
+    """Digits only, so '+1 (555) 123-4567' and '15551234567' match."""
+    return re.sub(r'\D', '', phone or '')
+
+def normalize_question(question: str) -> str:
+    """Lowercase words only, so 'Do you offer keratin?' and 'do you offer keratin' match."""
+    return ' '.join(re.findall(r'\w+', html.unescape(question or '').lower()))
+
 class HelpRequest:
     def __init__(
         self,
@@ -31,6 +47,10 @@ class HelpRequest:
         self.resolved_at = resolved_at
         self.supervisor_answer = supervisor_answer
         self.timeout_minutes = timeout_minutes
+        # Other callers waiting on the same question (filled by resolve_request)
+        self.subscribers: List[str] = []
+        # True when create_help_request attached the caller to this open request
+        self.joined = False
     
     def to_dict(self):
         return {
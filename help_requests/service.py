@@ -1,24 +1,72 @@
 ﻿import asyncio
+import hashlib
 import json
 import logging
-from typing import List, Optional
-from datetime import datetime
-import redis
+import math
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timezone
 from markupsafe import escape          # ← NEW: prevents Jinja syntax errors
 
-from .models import HelpRequest, RequestStatus
+from . import events
+from .archive import HelpRequestArchive
+from .events import EVENTS_STREAM
+from .models import HelpRequest, RequestStatus, StatusConflict, TERMINAL_STATUSES, normalize_phone, normalize_question
 from config import Config
+from data_version import HELP_REQUESTS, queue_bump
+from redis_pool import get_async_redis
+from score_cursor import encode_cursor, parse_cursor, rows_after
+from search_index import HELP_REQUEST, SearchIndex, get_search_index
 
 logger = logging.getLogger(__name__)
 
 
 class HelpRequestService:
-    def __init__(self, redis_url: str = None):
+    # Pending documents outlive their deadline by this much so the timeout
+    # sweeper still finds them when it runs a little late.
+    PENDING_GRACE_SECONDS = 300
+    
+    # Statuses each supervisor action may start from. A late answer still
+    # resolves a timed-out request, but never replaces another answer.
+    RESOLVABLE = (RequestStatus.PENDING, RequestStatus.UNRESOLVED, RequestStatus.TIMEOUT)
+    UNRESOLVABLE = (RequestStatus.PENDING, RequestStatus.TIMEOUT)
+    
+    def __init__(
+        self,
+        redis_url: str = None,
+        archive: Optional[HelpRequestArchive] = None,
+        search: Optional[SearchIndex] = None
+    ):
         self.redis_url = redis_url or Config.REDIS_URL
-        self.redis = redis.from_url(self.redis_url, decode_responses=True)
         self.request_timeout = Config.REQUEST_TIMEOUT_MINUTES * 60
+        
+        # SQLite history for requests that have left Redis (empty path disables it)
+        if archive is None and Config.ARCHIVE_DB_PATH:
+            archive = HelpRequestArchive(Config.ARCHIVE_DB_PATH)
+        self.archive = archive
+        # Kept current by every write below (see search_index)
+        self.search = search if search is not None else get_search_index()
+    
+    @property
+    def redis(self):
+        # Shared per-process pool, one per event loop (see redis_pool)
+        return get_async_redis(self.redis_url)
     
-    async def create_help_request(self, customer_phone: str, question: str, context: str = '') -> HelpRequest:
+    async def create_help_request(
+        self,
+        customer_phone: str,
+        question: str,
+        context: str = '',
+        coalesce: bool = True
+    ) -> HelpRequest:
+        """Open a help request, or join the caller to an open one for the same question.
+        
+        With ``coalesce`` a question that already has a pending request (after
+        normalize_question) does not create a second one: the caller is added
+        to that request's subscribers and the existing request is returned
+        with ``joined`` set, so no new supervisor notification is needed.
+        """
         # --- ESCAPE USER TEXT BEFORE STORAGE -----------------------------
         question = escape(question)
         context  = escape(context)
@@ -31,23 +79,86 @@ class HelpRequestService:
             timeout_minutes=Config.REQUEST_TIMEOUT_MINUTES
         )
         
+        if not coalesce:
+            pipe = self.redis.pipeline()
+            self._queue_create(pipe, help_request)
+            await pipe.execute()
+            await self._index_for_search([help_request])
+            logger.info(f'Created help request {help_request.id} for {customer_phone}')
+            return help_request
+        
+        open_key = self._open_question_key(help_request.question)
+        for _ in range(2):
+            # Claim the question or join its open request; WATCH makes
+            # concurrent callers with the same question agree on one request.
+            open_id = await self.redis.transaction(
+                lambda pipe: self._queue_create_or_join(pipe, help_request, open_key),
+                open_key,
+                value_from_callable=True
+            )
+            if open_id is None:
+                await self._index_for_search([help_request])
+                logger.info(f'Created help request {help_request.id} for {customer_phone}')
+                return help_request
+            
+            existing = await self.get_help_request(open_id)
+            if existing is not None:
+                # Joined while pending; if it was answered since, the caller
+                # was already a subscriber and gets that answer.
+                existing.joined = True
+                logger.info(f'Added {customer_phone} as a subscriber of help request {open_id}')
+                return existing
+            # The open request is gone without its claim being released
+            await self.redis.delete(open_key)
+        
+        raise RuntimeError(f'Could not open a help request for {customer_phone}')
+    
+    async def _queue_create_or_join(self, pipe, help_request: HelpRequest, open_key: str) -> Optional[str]:
+        open_id = await pipe.get(open_key)
+        if open_id:
+            # Only join a request that is still pending; a claim left behind by
+            # one that has since timed out or been answered is taken over.
+            request_key = f'help_request:{open_id}'
+            await pipe.watch(request_key)
+            claimed = self._parse_documents([open_id], [await pipe.get(request_key)])[0]
+            if claimed is None or claimed.status != RequestStatus.PENDING:
+                open_id = None
+        pipe.multi()
+        if open_id:
+            subscribers_key = f'help_request:{open_id}:subscribers'
+            pipe.sadd(subscribers_key, help_request.customer_phone)
+            pipe.expire(subscribers_key, self.request_timeout + self.PENDING_GRACE_SECONDS)
+            self._queue_customer_index(pipe, help_request.customer_phone, open_id, help_request.created_at)
+            return open_id
+        
+        pipe.set(open_key, help_request.id, ex=self.request_timeout + self.PENDING_GRACE_SECONDS)
+        self._queue_create(pipe, help_request)
+        return None
+    
+    def _queue_create(self, pipe, help_request: HelpRequest):
         key = f'help_request:{help_request.id}'
-        self.redis.setex(
+        pipe.setex(
             key, 
-            self.request_timeout,
+            self.request_timeout + self.PENDING_GRACE_SECONDS,
             json.dumps(help_request.to_dict())
         )
-        
-        self.redis.lpush('help_requests:pending', help_request.id)
-        
-        logger.info(f'Created help request {help_request.id} for {customer_phone}')
-        return help_request
+        pipe.zadd('help_requests:queue', {help_request.id: self._timestamp(help_request.created_at)})
+        pipe.zadd('help_requests:deadlines', {help_request.id: self._deadline(help_request)})
+        self._queue_customer_index(pipe, help_request.customer_phone, help_request.id, help_request.created_at)
+        self._queue_event(pipe, events.CREATED, help_request)
+        queue_bump(pipe, HELP_REQUESTS)
+    
+    async def get_subscribers(self, request_id: str) -> List[str]:
+        """Phone numbers that joined the request after it was opened."""
+        return list(await self.redis.smembers(f'help_request:{request_id}:subscribers'))
     
     async def get_help_request(self, request_id: str) -> Optional[HelpRequest]:
         key = f'help_request:{request_id}'
-        data = self.redis.get(key)
+        data = await self.redis.get(key)
         
         if not data:
+            if self.archive is not None:
+                return await asyncio.to_thread(self.archive.get, request_id)
             return None
         
         try:
@@ -57,76 +168,636 @@ class HelpRequestService:
             logger.error(f'Error decoding help request {request_id}: {e}')
             return None
     
+    async def get_help_requests(self, request_ids: List[str]) -> List[HelpRequest]:
+        """Load many requests with one MGET per 500 ids, in the order given.
+        
+        Ids whose documents have expired or cannot be decoded are skipped.
+        """
+        return [help_request for help_request in await self._fetch_requests(request_ids) if help_request]
+    
     async def get_pending_requests(self) -> List[HelpRequest]:
-        pending_ids = self.redis.lrange('help_requests:pending', 0, -1)
-        requests = []
+        # help_requests:queue is scored by created_at, so this is newest first
+        pending_ids = await self.redis.zrevrange('help_requests:queue', 0, -1)
         
-        for request_id in pending_ids:
-            request = await self.get_help_request(request_id)
-            if request:
-                if request.is_timed_out():
-                    request.mark_timeout()
-                    await self.update_help_request(request)
-                elif request.status == RequestStatus.PENDING:
-                    requests.append(request)
+        # Read only: overdue requests are moved to TIMEOUT by sweep_timeouts
+        return [
+            request for request in await self.get_help_requests(pending_ids)
+            if request.status == RequestStatus.PENDING and not request.is_timed_out()
+        ]
+    
+    async def list_pending(self, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[HelpRequest], Optional[str]]:
+        """Page through the pending queue, newest first.
         
-        return sorted(requests, key=lambda x: x.created_at, reverse=True)
+        Same cursor scheme as list_resolved: pass the returned cursor back to
+        get the next page; it is None on the last page. Requests past their
+        deadline are left out, so a page can be shorter than ``limit``.
+        Raises ValueError for a malformed cursor.
+        """
+        # One extra row tells us whether another page exists
+        rows = await rows_after(self.redis, 'help_requests:queue', parse_cursor(cursor), limit + 1)
+        page = rows[:limit]
+        requests = [
+            request for request in await self.get_help_requests([request_id for request_id, _ in page])
+            if request.status == RequestStatus.PENDING and not request.is_timed_out()
+        ]
+        return requests, encode_cursor(*page[-1]) if len(rows) > limit else None
     
     async def get_resolved_requests(self) -> List[HelpRequest]:
+        request_ids = await self.redis.zrevrange('help_requests:resolved', 0, -1)
+        return await self._load_resolved(request_ids)
+    
+    async def list_resolved(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[HelpRequest], Optional[str]]:
+        """Page through terminal requests, most recently resolved first.
+        
+        Reads help_requests:resolved (scored by resolved_at), so a page costs
+        O(log N + limit) whatever the keyspace size. Once Redis runs out the
+        page continues from the SQLite archive, which holds everything older.
+        Pass the returned cursor back to get the next page; it is None on the
+        last page. The cursor is the (resolved_at, id) position of the last
+        request shown, so requests resolved at the same instant are never
+        skipped between pages. Raises ValueError for a malformed cursor.
+        """
+        after = parse_cursor(cursor)
+        since_ts = self._timestamp(since) if since else None
+        
+        # One extra row tells us whether another page exists
+        rows = await rows_after(
+            self.redis, 'help_requests:resolved', after, limit + 1,
+            max_score=self._timestamp(until) if until else '+inf',
+            min_score='-inf' if since_ts is None else since_ts
+        )
+        page = rows[:limit]
+        requests = await self._load_resolved([request_id for request_id, _ in page])
+        has_more = len(rows) > limit
+        if self.archive is None:
+            return requests, encode_cursor(*page[-1]) if has_more else None
+        
+        # Merge in the archive, which holds everything older, in the same
+        # (resolved_at, id) order. When Redis filled the page only archived
+        # requests tied with or newer than its last row can still land on it.
+        if after:
+            before, before_id = after
+        else:
+            before = math.nextafter(self._timestamp(until), math.inf) if until else math.inf
+            before_id = None
+        archive_since = since_ts
+        if has_more:
+            archive_since = max(page[-1][1], since_ts if since_ts is not None else -math.inf)
+        archived = await asyncio.to_thread(self.archive.list_resolved, before, archive_since, limit + 1, before_id)
+        
+        scores = dict(page)
+        positioned = [((scores[help_request.id], help_request.id), help_request) for help_request in requests]
+        # A request being archived right now can briefly be in both tiers
+        positioned.extend(
+            ((score, help_request.id), help_request) for help_request, score in archived if help_request.id not in scores
+        )
+        positioned.sort(key=lambda item: item[0], reverse=True)
+        
+        requests = [help_request for _, help_request in positioned[:limit]]
+        if len(positioned) > limit:
+            last_score, last_id = positioned[limit - 1][0]
+        elif has_more:
+            # Some documents on this page had expired; carry on after its last row
+            last_id, last_score = page[-1]
+        else:
+            return requests, None
+        return requests, encode_cursor(last_id, last_score)
+    
+    async def _load_resolved(self, request_ids: List[str]) -> List[HelpRequest]:
+        requests = []
+        expired = []
+        for request_id, help_request in zip(request_ids, await self._fetch_requests(request_ids)):
+            if help_request is None:
+                expired.append(request_id)
+            else:
+                requests.append(help_request)
+        
+        if expired:
+            # The documents carry a TTL; drop their ids from the history index
+            await self.redis.zrem('help_requests:resolved', *expired)
+        return requests
+    
+    async def _fetch_requests(self, request_ids: List[str], batch_size: int = 500) -> List[Optional[HelpRequest]]:
+        """MGET the documents in batches; None marks a missing or invalid one."""
+        requests = []
+        for start in range(0, len(request_ids), batch_size):
+            batch = request_ids[start:start + batch_size]
+            requests.extend(self._parse_documents(batch, await self.redis.mget([f'help_request:{i}' for i in batch])))
+        return requests
+    
+    def _parse_documents(self, request_ids: List[str], docs: List[Optional[str]]) -> List[Optional[HelpRequest]]:
         requests = []
-        pattern = 'help_request:*'
-        
-        for key in self.redis.scan_iter(pattern):
-            if key.startswith('help_request:'):
-                data = self.redis.get(key)
-                if data:
-                    try:
-                        request_data = json.loads(data)
-                        request = self._dict_to_help_request(request_data)
-                        if request.status in [RequestStatus.RESOLVED, RequestStatus.UNRESOLVED, RequestStatus.TIMEOUT]:
-                            requests.append(request)
-                    except json.JSONDecodeError:
-                        continue
-        
-        return sorted(requests, key=lambda x: x.resolved_at or x.created_at, reverse=True)
-    
-    async def update_help_request(self, help_request: HelpRequest):
+        for request_id, data in zip(request_ids, docs):
+            if not data:
+                requests.append(None)
+                continue
+            try:
+                requests.append(self._dict_to_help_request(json.loads(data)))
+            except (json.JSONDecodeError, KeyError, ValueError) as e:
+                logger.warning(f'Skipping invalid help request {request_id}: {e}')
+                requests.append(None)
+        return requests
+    
+    async def update_help_request(
+        self,
+        help_request: HelpRequest,
+        event: Optional[str] = None,
+        previous_status: Optional[RequestStatus] = None
+    ):
+        """Write the request and its indexes in one MULTI.
+        
+        ``event`` is appended to the event stream. Pass ``previous_status``
+        when the status changed so the per-status counters follow it.
+        """
+        pending = help_request.status == RequestStatus.PENDING
+        # Only the request holding the claim may release it; while it does,
+        # other callers join instead of claiming, so the GET cannot go stale.
+        release_claim = (
+            not pending
+            and await self.redis.get(self._open_question_key(help_request.question)) == help_request.id
+        )
+        
+        pipe = self.redis.pipeline()
+        self._queue_update(pipe, help_request, event, previous_status, release_claim)
+        await pipe.execute()
+        await self._index_for_search([help_request])
+    
+    def _queue_update(
+        self,
+        pipe,
+        help_request: HelpRequest,
+        event: Optional[str],
+        previous_status: Optional[RequestStatus],
+        release_claim: bool
+    ):
         key = f'help_request:{help_request.id}'
+        pending = help_request.status == RequestStatus.PENDING
         
-        self.redis.setex(
+        pipe.setex(
             key,
-            self.request_timeout,
+            self.request_timeout + (self.PENDING_GRACE_SECONDS if pending else 0),
             json.dumps(help_request.to_dict())
         )
         
-        if help_request.status == RequestStatus.PENDING:
-            if not self.redis.lpos('help_requests:pending', help_request.id):
-                self.redis.lpush('help_requests:pending', help_request.id)
+        if help_request.status in TERMINAL_STATUSES:
+            resolved_at = help_request.resolved_at or help_request.created_at
+            pipe.zadd('help_requests:resolved', {help_request.id: self._timestamp(resolved_at)})
+            pipe.zrem('help_requests:deadlines', help_request.id)
+        else:
+            pipe.zrem('help_requests:resolved', help_request.id)
+            pipe.zadd('help_requests:deadlines', {help_request.id: self._deadline(help_request)})
+        
+        if pending:
+            pipe.zadd('help_requests:queue', {help_request.id: self._timestamp(help_request.created_at)})
         else:
-            self.redis.lrem('help_requests:pending', 0, help_request.id)
+            pipe.zrem('help_requests:queue', help_request.id)
+        
+        if release_claim:
+            pipe.delete(self._open_question_key(help_request.question))
+        
+        self._queue_customer_index(pipe, help_request.customer_phone, help_request.id, help_request.created_at)
+        if previous_status is not None and previous_status != help_request.status:
+            self._queue_status_change(pipe, previous_status, help_request.status)
+        if event:
+            self._queue_event(pipe, event, help_request)
+        queue_bump(pipe, HELP_REQUESTS)
     
     async def resolve_request(self, request_id: str, answer: str) -> HelpRequest:
-        help_request = await self.get_help_request(request_id)
-        if not help_request:
-            raise ValueError(f'Help request {request_id} not found')
+        """Resolve one request, atomically with respect to other supervisors and the sweeper.
         
-        help_request.resolve(answer)
-        await self.update_help_request(help_request)
+        Raises ValueError if the request does not exist and StatusConflict if
+        it was already resolved.
+        """
+        help_request = await self._transition(
+            request_id, lambda help_request: help_request.resolve(answer), events.RESOLVED, self.RESOLVABLE
+        )
+        help_request.subscribers = await self.get_subscribers(request_id)
         
         logger.info(f'Resolved help request {request_id}')
         return help_request
     
-    async def mark_request_unresolved(self, request_id: str) -> HelpRequest:
-        help_request = await self.get_help_request(request_id)
-        if not help_request:
+    async def resolve_many(
+        self,
+        request_ids: List[str],
+        answer: str
+    ) -> Tuple[List[HelpRequest], List[str], List[HelpRequest]]:
+        """Resolve several requests with the same answer in one transaction.
+        
+        Returns the resolved requests (each with ``subscribers`` filled in),
+        the ids that were not found, and the requests left alone because
+        they were already resolved.
+        """
+        resolved, missing, conflicts = await self._transition_many(
+            request_ids, lambda help_request: help_request.resolve(answer), events.RESOLVED, self.RESOLVABLE
+        )
+        subscribers = await self.get_subscribers_many([help_request.id for help_request in resolved])
+        for help_request in resolved:
+            help_request.subscribers = subscribers[help_request.id]
+        
+        logger.info(f'Resolved {len(resolved)} help requests in one batch')
+        return resolved, missing, conflicts
+    
+    async def mark_many_unresolved(
+        self,
+        request_ids: List[str]
+    ) -> Tuple[List[HelpRequest], List[str], List[HelpRequest]]:
+        """Batch counterpart of mark_request_unresolved, with the same return shape as resolve_many."""
+        updated, missing, conflicts = await self._transition_many(
+            request_ids, HelpRequest.mark_unresolved, events.UNRESOLVED, self.UNRESOLVABLE
+        )
+        logger.info(f'Marked {len(updated)} help requests as unresolved in one batch')
+        return updated, missing, conflicts
+    
+    async def get_subscribers_many(self, request_ids: List[str]) -> Dict[str, List[str]]:
+        pipe = self.redis.pipeline(transaction=False)
+        for request_id in request_ids:
+            pipe.smembers(f'help_request:{request_id}:subscribers')
+        return {request_id: list(members) for request_id, members in zip(request_ids, await pipe.execute())}
+    
+    async def _transition(self, request_id: str, apply, event: str, allowed_from) -> HelpRequest:
+        updated, missing, conflicts = await self._transition_many([request_id], apply, event, allowed_from)
+        if missing:
             raise ValueError(f'Help request {request_id} not found')
+        if conflicts:
+            raise StatusConflict(f'Help request {request_id} is already {conflicts[0].status.value}')
+        return updated[0]
+    
+    async def _transition_many(self, request_ids: List[str], apply, event: str, allowed_from):
+        """Compare-and-set status transitions under WATCH.
+        
+        Each request is read, checked against ``allowed_from`` and written
+        in one MULTI; if any of them changes in between (another supervisor,
+        the timeout sweeper) the whole batch is re-read and re-checked.
+        """
+        request_ids = list(dict.fromkeys(request_ids))
+        if not request_ids:
+            return [], [], []
+        keys = [f'help_request:{request_id}' for request_id in request_ids]
+        updated, missing, conflicts = await self.redis.transaction(
+            lambda pipe: self._queue_transitions(pipe, request_ids, keys, apply, event, allowed_from),
+            *keys,
+            value_from_callable=True
+        )
+        await self._index_for_search(updated)
+        return updated, missing, conflicts
+    
+    async def _queue_transitions(self, pipe, request_ids: List[str], keys: List[str], apply, event: str, allowed_from):
+        updated = []
+        missing = []
+        conflicts = []
+        for request_id, help_request in zip(request_ids, self._parse_documents(request_ids, await pipe.mget(keys))):
+            if help_request is None:
+                missing.append(request_id)
+            elif help_request.status not in allowed_from:
+                conflicts.append(help_request)
+            else:
+                updated.append(help_request)
+        
+        claims = await pipe.mget([self._open_question_key(help_request.question) for help_request in updated]) if updated else []
+        pipe.multi()
+        for help_request, claim in zip(updated, claims):
+            previous_status = help_request.status
+            apply(help_request)
+            release_claim = help_request.status != RequestStatus.PENDING and claim == help_request.id
+            self._queue_update(pipe, help_request, event, previous_status, release_claim)
+        return updated, missing, conflicts
+    
+    async def mark_request_unresolved(self, request_id: str) -> HelpRequest:
+        """Mark a pending or timed-out request unresolved; never overwrites an answer.
         
-        help_request.mark_unresolved()
-        await self.update_help_request(help_request)
+        Raises ValueError if the request does not exist and StatusConflict if
+        it is already resolved or unresolved.
+        """
+        help_request = await self._transition(
+            request_id, HelpRequest.mark_unresolved, events.UNRESOLVED, self.UNRESOLVABLE
+        )
         
         logger.info(f'Marked help request {request_id} as unresolved')
         return help_request
     
+    async def get_requests_for_customer(self, phone: str, limit: int = 10) -> List[HelpRequest]:
+        """A caller's most recent requests, newest first.
+        
+        Reads the per-customer index (one ZREVRANGE and one MGET), then tops
+        up from the SQLite archive when Redis holds fewer than ``limit``.
+        """
+        customer_key = normalize_phone(phone)
+        if not customer_key:
+            return []
+        
+        index_key = f'help_requests:customer:{customer_key}'
+        request_ids = await self.redis.zrevrange(index_key, 0, limit - 1)
+        requests = []
+        gone = []
+        for request_id, help_request in zip(request_ids, await self._fetch_requests(request_ids)):
+            if help_request is None:
+                gone.append(request_id)
+            else:
+                requests.append(help_request)
+        if gone:
+            # Archived or expired; the archive lookup below covers them
+            await self.redis.zrem(index_key, *gone)
+        
+        if len(requests) < limit and self.archive is not None:
+            seen = {help_request.id for help_request in requests}
+            archived = await asyncio.to_thread(self.archive.list_for_customer, customer_key, limit)
+            requests.extend(help_request for help_request in archived if help_request.id not in seen)
+            requests.sort(key=lambda x: x.created_at, reverse=True)
+        
+        return requests[:limit]
+    
+    async def get_stats(self) -> Dict[str, int]:
+        """Request counts per status, without reading any documents.
+        
+        ``pending`` is the size of the pending queue. The terminal counts are
+        running totals kept by the write paths, so they include requests
+        whose documents have since expired.
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zcard('help_requests:queue')
+        pipe.hgetall('help_requests:stats')
+        pending, counts = await pipe.execute()
+        
+        stats = {status.value: int(counts.get(status.value, 0)) for status in TERMINAL_STATUSES}
+        stats[RequestStatus.PENDING.value] = pending
+        return stats
+    
+    async def sweep_timeouts(self, batch_size: int = 100, now: Optional[datetime] = None) -> int:
+        """Move every pending request past its deadline to TIMEOUT.
+        
+        Works through help_requests:deadlines a batch at a time. Each batch
+        is one WATCH/MULTI transaction, so a request resolved by a supervisor
+        while the batch is in flight is never overwritten. Returns the number
+        of requests that timed out.
+        """
+        now_ts = self._timestamp(now or datetime.utcnow())
+        timed_out = 0
+        
+        while True:
+            request_ids = await self.redis.zrangebyscore('help_requests:deadlines', '-inf', now_ts, start=0, num=batch_size)
+            if not request_ids:
+                return timed_out
+            
+            keys = [f'help_request:{request_id}' for request_id in request_ids]
+            expired = await self.redis.transaction(
+                lambda pipe: self._queue_timeouts(pipe, request_ids, keys),
+                *keys,
+                value_from_callable=True
+            )
+            timed_out += len(expired)
+            await self._update_search_status({request_id: RequestStatus.TIMEOUT.value for request_id in expired})
+            for request_id in expired:
+                logger.info(f'Help request {request_id} timed out')
+    
+    async def _queue_timeouts(self, pipe, request_ids: List[str], keys: List[str]) -> List[str]:
+        expired = []
+        requests = []
+        for request_id, data in zip(request_ids, await pipe.mget(keys)):
+            help_request = None
+            if data:
+                try:
+                    help_request = self._dict_to_help_request(json.loads(data))
+                except (json.JSONDecodeError, KeyError, ValueError) as e:
+                    logger.warning(f'Dropping invalid help request {request_id} from the deadline index: {e}')
+            requests.append(help_request)
+        
+        # Release the open claims held by the requests timing out, so the next
+        # caller with the same question opens a new request instead of joining
+        # (and later being texted the answer to) this one.
+        timing_out = [
+            help_request for help_request in requests
+            if help_request is not None and help_request.status == RequestStatus.PENDING
+        ]
+        claims = await pipe.mget([self._open_question_key(help_request.question) for help_request in timing_out]) if timing_out else []
+        claimed = {help_request.id for help_request, claim in zip(timing_out, claims) if claim == help_request.id}
+        
+        pipe.multi()
+        for request_id, help_request in zip(request_ids, requests):
+            pipe.zrem('help_requests:deadlines', request_id)
+            if help_request is None:
+                # Expired or unreadable; nothing left to time out
+                pipe.zrem('help_requests:queue', request_id)
+                continue
+            if help_request.status != RequestStatus.PENDING:
+                continue
+            
+            help_request.mark_timeout()
+            pipe.setex(f'help_request:{request_id}', self.request_timeout, json.dumps(help_request.to_dict()))
+            pipe.zadd('help_requests:resolved', {request_id: self._timestamp(help_request.resolved_at)})
+            pipe.zrem('help_requests:queue', request_id)
+            if request_id in claimed:
+                pipe.delete(self._open_question_key(help_request.question))
+            self._queue_customer_index(pipe, help_request.customer_phone, help_request.id, help_request.created_at)
+            self._queue_status_change(pipe, RequestStatus.PENDING, RequestStatus.TIMEOUT)
+            self._queue_event(pipe, events.TIMEOUT, help_request)
+            expired.append(request_id)
+        if expired:
+            queue_bump(pipe, HELP_REQUESTS)
+        return expired
+    
+    async def migrate_pending_list(self) -> int:
+        """Move the legacy help_requests:pending list into help_requests:queue.
+        
+        Older versions kept the pending queue as a list; ids are re-scored by
+        the created_at of their document and duplicates collapse. Ids whose
+        document has expired are dropped. Safe to re-run.
+        """
+        if await self.redis.type('help_requests:pending') != 'list':
+            return 0
+        
+        request_ids = list(dict.fromkeys(await self.redis.lrange('help_requests:pending', 0, -1)))
+        queue = {}
+        deadlines = {}
+        for help_request in await self.get_help_requests(request_ids):
+            if help_request.status == RequestStatus.PENDING:
+                queue[help_request.id] = self._timestamp(help_request.created_at)
+                deadlines[help_request.id] = self._deadline(help_request)
+        
+        pipe = self.redis.pipeline()
+        if queue:
+            pipe.zadd('help_requests:queue', queue)
+            pipe.zadd('help_requests:deadlines', deadlines)
+        pipe.delete('help_requests:pending')
+        queue_bump(pipe, HELP_REQUESTS)
+        await pipe.execute()
+        
+        logger.info(f'Migrated {len(queue)} pending help requests to help_requests:queue')
+        return len(queue)
+    
+    async def archive_resolved(self, older_than_minutes: float = None, batch_size: int = 500) -> int:
+        """Move requests resolved more than ``older_than_minutes`` ago into the SQLite archive.
+        
+        Works oldest first, one batch per WATCH/MULTI transaction: the batch
+        is committed to SQLite, then its documents and index entries are
+        removed from Redis. A request changed in the meantime makes the batch
+        retry. Returns the number of requests archived.
+        """
+        if self.archive is None:
+            return 0
+        if older_than_minutes is None:
+            older_than_minutes = Config.ARCHIVE_AFTER_MINUTES
+        cutoff = time.time() - older_than_minutes * 60
+        archived = 0
+        
+        while True:
+            request_ids = await self.redis.zrangebyscore('help_requests:resolved', '-inf', cutoff, start=0, num=batch_size)
+            if not request_ids:
+                return archived
+            
+            keys = [f'help_request:{request_id}' for request_id in request_ids]
+            archived += await self.redis.transaction(
+                lambda pipe: self._queue_archive(pipe, request_ids, keys),
+                *keys,
+                value_from_callable=True
+            )
+    
+    async def _queue_archive(self, pipe, request_ids: List[str], keys: List[str]) -> int:
+        requests = []
+        for request_id, data in zip(request_ids, await pipe.mget(keys)):
+            if not data:
+                continue  # expired before it could be archived
+            try:
+                help_request = self._dict_to_help_request(json.loads(data))
+            except (json.JSONDecodeError, KeyError, ValueError) as e:
+                logger.warning(f'Dropping invalid help request {request_id} instead of archiving it: {e}')
+                continue
+            if help_request.status in TERMINAL_STATUSES:
+                requests.append(help_request)
+        
+        # INSERT OR REPLACE, so a retried batch is stored again harmlessly
+        await asyncio.to_thread(self.archive.store, requests)
+        
+        pipe.multi()
+        pipe.zrem('help_requests:resolved', *request_ids)
+        if requests:
+            pipe.delete(*[f'help_request:{help_request.id}' for help_request in requests])
+        return len(requests)
+    
+    async def rebuild_indexes(self, batch_size: int = 500) -> int:
+        """Backfill the help_requests:* indexes and the search index from the stored help_request:* documents.
+        
+        Needed once for requests written before the index existed; safe to re-run.
+        """
+        resolved = {}
+        queue = {}
+        deadlines = {}
+        status_counts = {status.value: 0 for status in TERMINAL_STATUSES}
+        batch = []
+        
+        async def index_batch(keys):
+            # Per-customer indexes are written as we go; there is one key per caller
+            customer_pipe = self.redis.pipeline(transaction=False)
+            searchable = []
+            for key, data in zip(keys, await self.redis.mget(keys)):
+                if not data:
+                    continue
+                try:
+                    help_request = self._dict_to_help_request(json.loads(data))
+                except (json.JSONDecodeError, KeyError, ValueError) as e:
+                    logger.warning(f'Skipping invalid help request {key}: {e}')
+                    continue
+                self._queue_customer_index(customer_pipe, help_request.customer_phone, help_request.id, help_request.created_at)
+                searchable.append(help_request)
+                if help_request.status in TERMINAL_STATUSES:
+                    resolved_at = help_request.resolved_at or help_request.created_at
+                    resolved[help_request.id] = self._timestamp(resolved_at)
+                    status_counts[help_request.status.value] += 1
+                else:
+                    queue[help_request.id] = self._timestamp(help_request.created_at)
+                    deadlines[help_request.id] = self._deadline(help_request)
+            await customer_pipe.execute()
+            await self._index_for_search(searchable)
+        
+        async for key in self.redis.scan_iter('help_request:*', count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                await index_batch(batch)
+                batch = []
+        if batch:
+            await index_batch(batch)
+        
+        if resolved:
+            await self.redis.zadd('help_requests:resolved', resolved)
+        if queue:
+            await self.redis.zadd('help_requests:queue', queue)
+        if deadlines:
+            await self.redis.zadd('help_requests:deadlines', deadlines)
+        # Seed the running totals once; only requests still stored can be counted
+        if not await self.redis.exists('help_requests:stats'):
+            await self.redis.hset('help_requests:stats', mapping=status_counts)
+        bump = self.redis.pipeline(transaction=False)
+        queue_bump(bump, HELP_REQUESTS)
+        await bump.execute()
+        
+        logger.info(f'Indexed {len(resolved)} resolved help requests')
+        return len(resolved)
+    
+    async def _index_for_search(self, requests: List[HelpRequest]):
+        if self.search is None or not requests:
+            return
+        documents = [
+            (help_request.id, help_request.question, help_request.supervisor_answer, help_request.status.value)
+            for help_request in requests
+        ]
+        try:
+            await asyncio.to_thread(self.search.index, HELP_REQUEST, documents)
+        except sqlite3.Error as e:
+            # Search lags behind until the next write or build-index; Redis stays authoritative
+            logger.warning(f'Could not update the search index for {len(documents)} help requests: {e}')
+    
+    async def _update_search_status(self, statuses: Dict[str, str]):
+        if self.search is None or not statuses:
+            return
+        try:
+            await asyncio.to_thread(self.search.set_status, HELP_REQUEST, statuses)
+        except sqlite3.Error as e:
+            logger.warning(f'Could not update the search index for {len(statuses)} help requests: {e}')
+    
+    def _queue_customer_index(self, pipe, customer_phone: str, request_id: str, created_at: datetime):
+        customer_key = normalize_phone(customer_phone)
+        if not customer_key:
+            return
+        index_key = f'help_requests:customer:{customer_key}'
+        pipe.zadd(index_key, {request_id: self._timestamp(created_at)})
+        # Outlives the newest document it points to; older history is in the archive
+        pipe.expire(index_key, self.request_timeout + self.PENDING_GRACE_SECONDS)
+    
+    @staticmethod
+    def _open_question_key(question: str) -> str:
+        digest = hashlib.sha1(normalize_question(question).encode('utf-8')).hexdigest()[:16]
+        return f'help_requests:open:{digest}'
+    
+    @staticmethod
+    def _queue_status_change(pipe, previous_status: RequestStatus, status: RequestStatus):
+        # Pending is counted by the queue itself; only terminal totals live here
+        if previous_status in TERMINAL_STATUSES:
+            pipe.hincrby('help_requests:stats', previous_status.value, -1)
+        if status in TERMINAL_STATUSES:
+            pipe.hincrby('help_requests:stats', status.value, 1)
+    
+    @staticmethod
+    def _queue_event(pipe, event_type: str, help_request: HelpRequest):
+        pipe.xadd(
+            EVENTS_STREAM, events.event_fields(event_type, help_request),
+            maxlen=Config.HELP_REQUEST_EVENTS_MAXLEN, approximate=True
+        )
+    
+    @staticmethod
+    def _timestamp(value: datetime) -> float:
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    
+    @classmethod
+    def _deadline(cls, help_request: HelpRequest) -> float:
+        return cls._timestamp(help_request.created_at) + help_request.timeout_minutes * 60
+    
     def _dict_to_help_request(self, data: dict) -> HelpRequest:
         created_at = datetime.fromisoformat(data['created_at']) if data['created_at'] else datetime.utcnow()
         resolved_at = datetime.fromisoformat(data['resolved_at']) if data['resolved_at'] else None
@@ -0,0 +1,80 @@
+import abc
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask(abc.ABC):
+    """Background asyncio task that calls ``run_once`` every ``interval`` seconds."""
+
+    name = "periodic-task"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task = None
+
+    @abc.abstractmethod
+    async def run_once(self):
+        """One pass of the task; errors are logged and the next pass runs as usual."""
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=self.name)
+        return self._task
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"{self.name} failed, will retry: {e}")
+            await asyncio.sleep(self.interval)
+
+
+class TimeoutSweeper(PeriodicTask):
+    """Times out overdue help requests.
+
+    Calls HelpRequestService.sweep_timeouts every ``interval`` seconds so
+    requests time out even when nobody is reading the pending queue.
+    """
+
+    name = "help-request-timeout-sweeper"
+
+    def __init__(self, help_service, interval: float = 15.0, batch_size: int = 100):
+        super().__init__(interval)
+        self.help_service = help_service
+        self.batch_size = batch_size
+
+    async def run_once(self):
+        await self.help_service.sweep_timeouts(batch_size=self.batch_size)
+
+
+class ArchiveSweeper(PeriodicTask):
+    """Moves old terminal help requests from Redis into the SQLite archive.
+
+    Must run more often than REQUEST_TIMEOUT_MINUTES, after which Redis
+    drops the documents on its own.
+    """
+
+    name = "help-request-archiver"
+
+    def __init__(self, help_service, interval: float = 60.0, batch_size: int = 500):
+        super().__init__(interval)
+        self.help_service = help_service
+        self.batch_size = batch_size
+
+    async def run_once(self):
+        count = await self.help_service.archive_resolved(batch_size=self.batch_size)
+        if count:
+            logger.info(f"Archived {count} help requests")
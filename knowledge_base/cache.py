@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class KnowledgeBaseCache:
+    """Size-bounded LRU cache for knowledge base reads.
+
+    Entries also expire after ``ttl_seconds`` as a backstop in case an
+    invalidation message is missed while the pub/sub listener reconnects.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every clear() and invalidate() so a reader that loaded data before an
+        # invalidation cannot put the stale value back afterwards.
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key, MISSING)
+            if item is MISSING:
+                self.misses += 1
+                return MISSING
+
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return MISSING
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def invalidate(self, *kinds):
+        """Drop the entries whose key starts with one of ``kinds``, e.g. "list"."""
+        with self._lock:
+            self.generation += 1
+            for key in [key for key in self._data if key[0] in kinds]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
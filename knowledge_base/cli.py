@@ -0,0 +1,116 @@
+"""
+Maintenance commands for the knowledge base.
+
+    python -m knowledge_base.cli build-index
+    python -m knowledge_base.cli import salon_faq.jsonl
+    python -m knowledge_base.cli export backup.csv
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import sys
+import time
+
+from .service import KnowledgeBaseService
+
+logger = logging.getLogger(__name__)
+
+CSV_FIELDS = ["id", "question", "answer", "source", "created_at", "usage_count", "last_used"]
+
+
+def _detect_format(path: str, fmt: str) -> str:
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def read_rows(handle, fmt: str):
+    """Yield one dict per row without reading the whole file."""
+    if fmt == "csv":
+        yield from csv.DictReader(handle)
+        return
+    for line_number, line in enumerate(handle, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping line {line_number}: {e}")
+
+
+async def build_index(args):
+    kb_service = KnowledgeBaseService()
+    count = await kb_service.rebuild_indexes(batch_size=args.batch_size)
+    print(f"Indexed {count} knowledge base questions")
+
+
+async def import_entries(args):
+    kb_service = KnowledgeBaseService()
+    fmt = _detect_format(args.path, args.format)
+    started = time.monotonic()
+    with open(args.path, newline="", encoding="utf-8-sig") as handle:
+        counts = await kb_service.add_entries(
+            read_rows(handle, fmt), source=args.source, batch_size=args.batch_size
+        )
+    elapsed = time.monotonic() - started
+    print(
+        f"Imported {args.path} in {elapsed:.1f}s: {counts['added']} added, "
+        f"{counts['updated']} updated, {counts['unchanged']} unchanged"
+    )
+
+
+async def export_entries(args):
+    kb_service = KnowledgeBaseService()
+    fmt = _detect_format(args.path, args.format)
+    handle = sys.stdout if args.path == "-" else open(args.path, "w", newline="", encoding="utf-8")
+    count = 0
+    try:
+        writer = csv.DictWriter(handle, fieldnames=CSV_FIELDS) if fmt == "csv" else None
+        if writer:
+            writer.writeheader()
+        async for entry in kb_service.export_entries(batch_size=args.batch_size):
+            if writer:
+                writer.writerow(entry)
+            else:
+                handle.write(json.dumps(entry) + "\n")
+            count += 1
+    finally:
+        if handle is not sys.stdout:
+            handle.close()
+    print(f"Exported {count} knowledge base entries", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Knowledge base maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser(
+        "build-index", help="Build the lookup and listing indexes for existing knowledge:* entries"
+    )
+    index_parser.add_argument("--batch-size", type=int, default=500)
+    index_parser.set_defaults(handler=build_index)
+
+    import_parser = subparsers.add_parser("import", help="Load entries from a JSONL or CSV file")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=["jsonl", "csv"], help="Defaults to the file extension")
+    import_parser.add_argument("--source", default="import", help="Source for rows that do not set one")
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    import_parser.set_defaults(handler=import_entries)
+
+    export_parser = subparsers.add_parser("export", help="Write all entries to a JSONL or CSV file ('-' for stdout)")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=["jsonl", "csv"], help="Defaults to the file extension")
+    export_parser.add_argument("--batch-size", type=int, default=1000)
+    export_parser.set_defaults(handler=export_entries)
+
+    args = parser.parse_args(argv)
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,187 @@
+import html
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class _Posting:
+    """Rows containing one term, with lazily materialized numpy arrays."""
+
+    __slots__ = ("rows", "weights", "_arrays")
+
+    def __init__(self):
+        self.rows = []
+        self.weights = []
+        self._arrays = None
+
+    def append(self, row: int, weight: float):
+        self.rows.append(row)
+        self.weights.append(weight)
+        self._arrays = None
+
+    def arrays(self):
+        if self._arrays is None:
+            self._arrays = (
+                np.asarray(self.rows, dtype=np.int32),
+                np.asarray(self.weights, dtype=np.float32),
+            )
+        return self._arrays
+
+
+class QuestionMatcher:
+    """In-memory fuzzy matcher for knowledge base questions.
+
+    Questions are represented as bags of words plus character trigrams, so
+    small wording and spelling differences still score well. Stored vectors
+    are L2-normalized term frequencies; queries are weighted by inverse
+    document frequency at search time, which keeps inserts and deletes
+    incremental. Scores are cosine similarities in [0, 1].
+    """
+
+    def __init__(self, max_df: float = 0.05, min_pruned_df: int = 1000):
+        # Terms found in more than max_df of all questions (and more than
+        # min_pruned_df of them) carry little weight but dominate the cost of
+        # a search. They still count towards the query norm, so scores can
+        # only be slightly underestimated, never inflated.
+        self.max_df = max_df
+        self.min_pruned_df = min_pruned_df
+        self._lock = threading.RLock()
+        self._postings: Dict[str, _Posting] = {}
+        self._df: Counter = Counter()
+        self._row_of: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._terms: List[Tuple[Tuple[str, float], ...]] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._live_count = 0
+
+    def __len__(self):
+        return self._live_count
+
+    def add(self, doc_id: str, text: str):
+        terms = self._features(text)
+        norm = math.sqrt(sum(tf * tf for tf in terms.values())) or 1.0
+        weighted = tuple((term, tf / norm) for term, tf in terms.items())
+        with self._lock:
+            if doc_id in self._row_of:
+                self._remove_locked(doc_id)
+            self._insert_locked(doc_id, weighted)
+
+    def remove(self, doc_id: str) -> bool:
+        with self._lock:
+            if doc_id not in self._row_of:
+                return False
+            self._remove_locked(doc_id)
+            # Dead rows still sit in the postings; compact once they dominate
+            if len(self._ids) > 1024 and self._live_count < len(self._ids) // 2:
+                self._compact_locked()
+            return True
+
+    def search(self, text: str, k: int = 3, min_score: float = 0.0) -> List[Tuple[str, float]]:
+        terms = self._features(text)
+        if not terms or k <= 0:
+            return []
+
+        with self._lock:
+            size = len(self._ids)
+            if not self._live_count:
+                return []
+
+            n_docs = self._live_count
+            prune_df = max(self.min_pruned_df, self.max_df * n_docs)
+            query_norm = 0.0
+            rows_parts, weight_parts = [], []
+            rarest_pruned = None
+            for term, tf in terms.items():
+                df = self._df.get(term, 0)
+                weight = tf * math.log(1.0 + n_docs / (1.0 + df))
+                query_norm += weight * weight
+                posting = self._postings.get(term)
+                if posting is None:
+                    continue
+                if df > prune_df:
+                    if rarest_pruned is None or df < rarest_pruned[0]:
+                        rarest_pruned = (df, posting, weight)
+                    continue
+                rows, doc_weights = posting.arrays()
+                rows_parts.append(rows)
+                weight_parts.append(doc_weights * weight)
+
+            if not rows_parts and rarest_pruned is not None:
+                # Only very common terms in the query: rank on the rarest one
+                _, posting, weight = rarest_pruned
+                rows, doc_weights = posting.arrays()
+                rows_parts.append(rows)
+                weight_parts.append(doc_weights * weight)
+
+            if not rows_parts or query_norm == 0.0:
+                return []
+            # Sparse dot product of the query against every stored question
+            scores = np.bincount(
+                np.concatenate(rows_parts),
+                weights=np.concatenate(weight_parts),
+                minlength=size,
+            )
+            scores /= math.sqrt(query_norm)
+            scores[~self._alive[:size]] = 0.0
+
+            candidates = np.flatnonzero(scores >= max(min_score, 1e-6))
+            if len(candidates) > k:
+                top = np.argpartition(scores[candidates], -k)[-k:]
+                candidates = candidates[top]
+            ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self._ids[row], float(min(scores[row], 1.0))) for row in ordered]
+
+    def _insert_locked(self, doc_id: str, weighted: Tuple[Tuple[str, float], ...]):
+        row = len(self._ids)
+        self._ids.append(doc_id)
+        self._row_of[doc_id] = row
+        self._terms.append(weighted)
+        if row >= len(self._alive):
+            grown = np.zeros(max(64, 2 * len(self._alive)), dtype=bool)
+            grown[:len(self._alive)] = self._alive
+            self._alive = grown
+        self._alive[row] = True
+        self._live_count += 1
+
+        for term, weight in weighted:
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = _Posting()
+            posting.append(row, weight)
+            self._df[term] += 1
+
+    def _remove_locked(self, doc_id: str):
+        row = self._row_of.pop(doc_id)
+        self._alive[row] = False
+        self._live_count -= 1
+        for term, _ in self._terms[row]:
+            self._df[term] -= 1
+            if self._df[term] <= 0:
+                del self._df[term]
+
+    def _compact_locked(self):
+        live = [(self._ids[row], self._terms[row]) for row in range(len(self._ids)) if self._alive[row]]
+        self._postings = {}
+        self._df = Counter()
+        self._row_of = {}
+        self._ids = []
+        self._terms = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._live_count = 0
+        for doc_id, weighted in live:
+            self._insert_locked(doc_id, weighted)
+
+    @staticmethod
+    def _features(text: str) -> Counter:
+        words = _WORD_RE.findall(html.unescape(text or "").lower())
+        terms = Counter(f"w:{word}" for word in words)
+        for word in words:
+            padded = f" {word} "
+            terms.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return terms
@@ -1,3 +1,4 @@
+import hashlib
 from datetime import datetime
 from typing import Optional
 
@@ -12,8 +13,9 @@ class KnowledgeBaseEntry:
         usage_count: int = 0,
         last_used: Optional[datetime] = None
     ):
-        self.id = id or f"kb_{hash(question) & 0xFFFFFFFF}"
         self.question = question.lower().strip()
+        # Stable across processes (unlike hash()) and wide enough for bulk imports
+        self.id = id or f"kb_{hashlib.sha1(self.question.encode('utf-8')).hexdigest()[:16]}"
         self.answer = answer
         self.source = source
         self.created_at = created_at or datetime.utcnow()
@@ -33,4 +35,10 @@ class KnowledgeBaseEntry:
     
     def increment_usage(self):
         self.usage_count += 1
-        self.last_used = datetime.utcnow()
\ No newline at end of file
+        self.last_used = datetime.utcnow()
+    
+    def apply_usage(self, extra_count: int, last_used: Optional[datetime] = None):
+        """Merge usage tracked outside the stored document (see UsageTracker)."""
+        self.usage_count += extra_count
+        if last_used and last_used > self.last_used:
+            self.last_used = last_used
@@ -1,20 +1,70 @@
-﻿import json
+﻿import asyncio
+import html
+import itertools
+import json
 import logging
-import redis
-from typing import List, Optional
-from datetime import datetime
+import sqlite3
+import threading
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+from datetime import datetime, timezone
 from markupsafe import escape          # ← NEW: prevents Jinja syntax errors
 
+from .cache import MISSING, KnowledgeBaseCache
+from .matcher import QuestionMatcher
 from .models import KnowledgeBaseEntry
+from .usage import UsageTracker
 from config import Config
+from data_version import KNOWLEDGE as KNOWLEDGE_VERSION, queue_bump
+from redis_pool import get_async_redis, get_redis
+from score_cursor import encode_cursor, parse_cursor, rows_after
+from search_index import KNOWLEDGE, SearchIndex, get_search_index
 
 logger = logging.getLogger(__name__)
 
 
 class KnowledgeBaseService:
-    def __init__(self, redis_url: str = None):
+    # Bookkeeping keys that live next to the knowledge:<id> documents
+    INDEX_KEYS = (
+        "knowledge:index",
+        "knowledge:question_index",
+        "knowledge:usage",
+        "knowledge:last_used",
+        "knowledge:created",
+    )
+    
+    # add_entries announces up to this many entries one by one, so matchers
+    # and dashboards update in place; bigger imports send one "bulk" message.
+    MAX_ENTRY_INVALIDATIONS = 50
+    
+    def __init__(self, redis_url: str = None, cache_size: int = None, search: Optional[SearchIndex] = None):
         self.redis_url = redis_url or Config.REDIS_URL
-        self.redis = redis.from_url(self.redis_url, decode_responses=True)
+        # The invalidation listener and usage flusher run in their own
+        # threads, off the event loop, and use a blocking client.
+        self.sync_redis = get_redis(self.redis_url)
+        
+        # Optional in-process read cache, kept coherent across processes by
+        # the knowledge:invalidate pub/sub channel.
+        cache_size = Config.KB_CACHE_SIZE if cache_size is None else cache_size
+        self.cache = KnowledgeBaseCache(cache_size, Config.KB_CACHE_TTL_SECONDS) if cache_size > 0 else None
+        self._invalidation_thread = None
+        self._listener_lock = threading.Lock()
+        
+        # Fuzzy question matcher, loaded on first use of find_best_answers
+        self.matcher = None
+        self._matcher_entries = {}
+        self._matcher_lock = asyncio.Lock()
+        self._changes_seen = 0
+        
+        # Usage counters are buffered here and flushed in batches
+        self.usage = UsageTracker(self.sync_redis, Config.KB_USAGE_FLUSH_SECONDS, on_flush=self._invalidate_listings)
+        
+        # Kept current by every write below (see search_index)
+        self.search = search if search is not None else get_search_index()
+    
+    @property
+    def redis(self):
+        # Shared per-process pool, one per event loop (see redis_pool)
+        return get_async_redis(self.redis_url)
     
     async def add_entry(self, question: str, answer: str, source: str = "supervisor") -> KnowledgeBaseEntry:
         # --- ESCAPE USER TEXT BEFORE STORAGE -----------------------------
@@ -24,78 +74,523 @@ class KnowledgeBaseService:
         
         entry = KnowledgeBaseEntry(question, answer, source)
         
-        key = f"knowledge:{entry.id}"
-        self.redis.set(key, json.dumps(entry.to_dict()))
+        # Re-answering a known question replaces the existing entry so the
+        # question index keeps pointing at a single document.
+        existing_id = await self.redis.hget("knowledge:question_index", entry.question)
+        if existing_id:
+            entry.id = existing_id
         
-        self.redis.sadd("knowledge:index", key)
+        pipe = self.redis.pipeline()
+        self._queue_entry_write(pipe, entry)
+        queue_bump(pipe, KNOWLEDGE_VERSION)
+        pipe.publish("knowledge:invalidate", json.dumps({"op": "add", "id": entry.id, "entry": entry.to_dict()}))
+        await pipe.execute()
+        self._invalidate_cache()
+        self._matcher_add(entry.to_dict())
+        await self._index_for_search([entry])
         
         logger.info(f"Added knowledge base entry: {entry.id}")
         return entry
     
+    async def add_entries(
+        self,
+        items: Iterable[Union[dict, Tuple[str, str], Tuple[str, str, str]]],
+        source: str = "import",
+        batch_size: int = 500,
+    ) -> Dict[str, int]:
+        """Bulk insert entries from any iterable, one pipelined batch at a time.
+        
+        Items are ``(question, answer[, source])`` tuples or dicts with those
+        keys. The iterable is consumed lazily, so a generator over a large
+        file is never held in memory. Entries whose answer and source are
+        already stored are skipped.
+        """
+        counts = {"added": 0, "updated": 0, "unchanged": 0}
+        total_written = 0
+        
+        for batch in self._batched(items, batch_size):
+            # Last occurrence wins when a question repeats within the batch
+            entries = {}
+            for item in batch:
+                if isinstance(item, dict):
+                    question, answer = item.get("question"), item.get("answer")
+                    item_source = item.get("source") or source
+                else:
+                    question, answer = item[0], item[1]
+                    item_source = item[2] if len(item) > 2 else source
+                if not question or not answer:
+                    continue
+                entry = KnowledgeBaseEntry(escape(question), escape(answer), item_source)
+                entries[entry.question] = entry
+            
+            if not entries:
+                continue
+            
+            questions = list(entries)
+            existing_ids = await self.redis.hmget("knowledge:question_index", questions)
+            existing_docs = await self.redis.mget([f"knowledge:{entry_id}" for entry_id in existing_ids if entry_id])
+            existing_docs = iter(existing_docs)
+            
+            pipe = self.redis.pipeline(transaction=False)
+            written = []
+            for question, existing_id in zip(questions, existing_ids):
+                entry = entries[question]
+                if existing_id:
+                    data = next(existing_docs)
+                    stored = json.loads(data) if data else None
+                    if stored and stored.get("answer") == entry.answer and stored.get("source") == entry.source:
+                        counts["unchanged"] += 1
+                        continue
+                    entry.id = existing_id
+                    counts["updated" if stored else "added"] += 1
+                else:
+                    counts["added"] += 1
+                self._queue_entry_write(pipe, entry)
+                written.append(entry)
+            
+            if written:
+                queue_bump(pipe, KNOWLEDGE_VERSION)
+                total_written += len(written)
+                if total_written <= self.MAX_ENTRY_INVALIDATIONS:
+                    for entry in written:
+                        pipe.publish("knowledge:invalidate", json.dumps({"op": "add", "id": entry.id, "entry": entry.to_dict()}))
+                await pipe.execute()
+                for entry in written:
+                    self._matcher_add(entry.to_dict())
+                await self._index_for_search(written)
+        
+        if total_written > self.MAX_ENTRY_INVALIDATIONS:
+            # One coarse invalidation instead of a message per entry
+            await self.redis.publish("knowledge:invalidate", json.dumps({"op": "bulk"}))
+        if total_written:
+            self._invalidate_cache()
+        
+        logger.info(
+            f"Bulk loaded knowledge base: {counts['added']} added, "
+            f"{counts['updated']} updated, {counts['unchanged']} unchanged"
+        )
+        return counts
+    
+    async def export_entries(self, batch_size: int = 500) -> AsyncIterator[dict]:
+        """Yield every entry as a dict (usage counters merged), batch by batch.
+        
+        Question and answer are unescaped back to the text that was added, so
+        feeding the export to add_entries finds every entry unchanged.
+        """
+        async for keys in self._abatched(self.redis.sscan_iter("knowledge:index", count=batch_size), batch_size):
+            entry_ids = [key.split(":", 1)[1] for key in keys]
+            for entry in await self._fetch_entries(entry_ids):
+                data = entry.to_dict()
+                data["question"] = html.unescape(data["question"])
+                data["answer"] = html.unescape(data["answer"])
+                yield data
+    
     async def find_answer(self, question: str) -> Optional[str]:
         normalized_question = self._normalize_question(question)
         
-        index_keys = self.redis.smembers("knowledge:index")
-        if not index_keys:
+        cache_key = ("answer", normalized_question)
+        entry_data = self._cache_get(cache_key)
+        if entry_data is MISSING:
+            generation = self.cache.generation if self.cache else None
+            entry_data = await self._load_entry_for_question(normalized_question)
+            # Misses are cached too: most caller questions are not in the KB
+            self._cache_set(cache_key, entry_data, generation)
+        
+        if entry_data is None:
             return None
         
-        for key in index_keys:
-            data = self.redis.get(key)
-            if data:
-                try:
-                    entry_data = json.loads(data)
-                    if entry_data.get("question") == normalized_question:
-                        # Update usage
-                        entry_data["usage_count"] = entry_data.get("usage_count", 0) + 1
-                        entry_data["last_used"] = datetime.utcnow().isoformat()
-                        self.redis.set(key, json.dumps(entry_data))
-                        return entry_data["answer"]
-                except Exception as e:
-                    logger.warning(f"Error reading KB entry {key}: {e}")
-                    continue
+        self.usage.record(entry_data["id"])
+        return entry_data["answer"]
+    
+    async def find_best_answers(self, question: str, k: int = 3, min_score: float = 0.5) -> List[Tuple[KnowledgeBaseEntry, float]]:
+        """Rank KB entries by fuzzy similarity to the question, best first.
+        
+        Runs entirely in process; scores are in [0, 1] with 1 meaning the
+        same wording.
+        """
+        matcher = await self._get_matcher()
+        results = []
+        for entry_id, score in matcher.search(question, k, min_score):
+            entry_data = self._matcher_entries.get(entry_id)
+            if entry_data:
+                results.append((self._dict_to_kb_entry(entry_data), score))
+        return results
+    
+    async def record_usage(self, entry_id: str):
+        """Count a hit for an entry that was matched outside find_answer."""
+        self.usage.record(entry_id)
+    
+    async def _load_entry_for_question(self, normalized_question: str) -> Optional[dict]:
+        entry_id = await self.redis.hget("knowledge:question_index", normalized_question)
+        if not entry_id:
+            return None
+        
+        key = f"knowledge:{entry_id}"
+        data = await self.redis.get(key)
+        if not data:
+            # Entry vanished without going through delete_entry
+            await self.redis.hdel("knowledge:question_index", normalized_question)
+            return None
         
-        return None
+        try:
+            entry_data = json.loads(data)
+            entry_data.setdefault("id", entry_id)
+            return entry_data
+        except Exception as e:
+            logger.warning(f"Error reading KB entry {key}: {e}")
+            return None
     
     async def get_all_entries(self) -> List[KnowledgeBaseEntry]:
+        cached = self._cache_get(("all",))
+        if cached is not MISSING:
+            return list(cached)
+        
         entries = []
+        generation = self.cache.generation if self.cache else None
         
         try:
-            index_keys = self.redis.smembers("knowledge:index")
+            index_keys = list(await self.redis.smembers("knowledge:index"))
             
             if not index_keys:
                 return entries
             
-            for key in index_keys:
-                try:
-                    data = self.redis.get(key)
-                    if data:
-                        entry_data = json.loads(data)
-                        entry = self._dict_to_kb_entry(entry_data)
-                        entries.append(entry)
-                except Exception as e:
-                    logger.warning(f"Skipping invalid KB entry {key}: {e}")
-                    continue
+            entry_ids = [key.split(":", 1)[1] for key in index_keys]
+            for start in range(0, len(entry_ids), 500):
+                entries.extend(await self._fetch_entries(entry_ids[start:start + 500]))
             
-            return sorted(entries, key=lambda x: x.last_used, reverse=True)
+            entries = sorted(entries, key=lambda x: x.last_used, reverse=True)
+            self._cache_set(("all",), entries, generation)
+            return list(entries)
             
         except Exception as e:
             logger.error(f"Error getting knowledge entries: {e}")
             return []
     
+    async def list_entries(self, limit: int = 20, order: str = "last_used", cursor: Optional[str] = None) -> Tuple[List[KnowledgeBaseEntry], Optional[str]]:
+        """Return one page of entries, newest first by ``order``.
+        
+        ``order`` is "last_used" or "created_at". Only the requested page is
+        read from Redis. The second element is the cursor for the next page,
+        or None on the last page; see score_cursor for the format. Raises
+        ValueError for an unknown order or a malformed cursor.
+        """
+        if order not in ("last_used", "created_at"):
+            raise ValueError(f"Unknown knowledge base order: {order}")
+        after = parse_cursor(cursor)
+        
+        cache_key = ("list", order, cursor, limit)
+        cached = self._cache_get(cache_key)
+        if cached is not MISSING:
+            return list(cached[0]), cached[1]
+        generation = self.cache.generation if self.cache else None
+        
+        sort_key = "knowledge:last_used" if order == "last_used" else "knowledge:created"
+        # Ask for one extra row to know whether another page exists
+        rows = await rows_after(self.redis, sort_key, after, limit + 1)
+        page = rows[:limit]
+        entries = await self._fetch_entries([entry_id for entry_id, _ in page])
+        next_cursor = encode_cursor(*page[-1]) if len(rows) > limit else None
+        
+        self._cache_set(cache_key, (entries, next_cursor), generation)
+        return list(entries), next_cursor
+    
+    async def count_entries(self) -> int:
+        """Number of entries; knowledge:index is kept current by every write path."""
+        return await self.redis.scard("knowledge:index")
+    
     async def delete_entry(self, entry_id: str) -> bool:
         key = f"knowledge:{entry_id}"
         try:
-            result = self.redis.delete(key)
-            self.redis.srem("knowledge:index", key)
+            data = await self.redis.get(key)
+            question = json.loads(data).get("question") if data else None
+            
+            pipe = self.redis.pipeline()
+            pipe.delete(key)
+            pipe.srem("knowledge:index", key)
+            if question is not None and await self.redis.hget("knowledge:question_index", question) == entry_id:
+                pipe.hdel("knowledge:question_index", question)
+            pipe.hdel("knowledge:usage", entry_id)
+            pipe.zrem("knowledge:last_used", entry_id)
+            pipe.zrem("knowledge:created", entry_id)
+            queue_bump(pipe, KNOWLEDGE_VERSION)
+            pipe.publish("knowledge:invalidate", json.dumps({"op": "delete", "id": entry_id}))
+            result = (await pipe.execute())[0]
+            self.usage.discard([entry_id])
+            self._invalidate_cache()
+            self._matcher_remove(entry_id)
+            await self._remove_from_search([entry_id])
             return bool(result)
         except Exception as e:
             logger.error(f"Error deleting entry {entry_id}: {e}")
             return False
     
+    async def rebuild_indexes(self, batch_size: int = 500) -> int:
+        """Rebuild the question index and sorted sets from the knowledge:* documents.
+        
+        Needed once for data written before the indexes existed; safe to re-run.
+        When several documents share a question the most recently created wins.
+        """
+        mapping = {}
+        created = {}
+        doc_keys = []
+        searchable = []
+        created_scores = {}
+        last_used_scores = {}
+        
+        async def index_batch(keys):
+            for key, data in zip(keys, await self.redis.mget(keys)):
+                if not data:
+                    continue  # not a string key (index set/hash) or expired
+                try:
+                    entry_data = json.loads(data)
+                    question = entry_data["question"]
+                    entry_id = entry_data.get("id") or key.split(":", 1)[1]
+                except Exception as e:
+                    logger.warning(f"Skipping invalid KB entry {key}: {e}")
+                    continue
+                doc_keys.append(key)
+                entry = self._dict_to_kb_entry(entry_data)
+                entry.id = entry_id
+                searchable.append(entry)
+                created_scores[entry_id] = self._timestamp(entry.created_at)
+                last_used_scores[entry_id] = self._timestamp(entry.last_used)
+                created_at = entry_data.get("created_at") or ""
+                if question not in mapping or created_at >= created[question]:
+                    mapping[question] = entry_id
+                    created[question] = created_at
+        
+        batch = []
+        async for key in self.redis.scan_iter("knowledge:*", count=batch_size):
+            if key in self.INDEX_KEYS:
+                continue
+            batch.append(key)
+            if len(batch) >= batch_size:
+                await index_batch(batch)
+                batch = []
+        if batch:
+            await index_batch(batch)
+        
+        pipe = self.redis.pipeline()
+        pipe.delete("knowledge:question_index")
+        if mapping:
+            pipe.hset("knowledge:question_index", mapping=mapping)
+        if doc_keys:
+            pipe.sadd("knowledge:index", *doc_keys)
+            pipe.zadd("knowledge:created", created_scores)
+            pipe.zadd("knowledge:last_used", last_used_scores, gt=True)
+        queue_bump(pipe, KNOWLEDGE_VERSION)
+        pipe.publish("knowledge:invalidate", json.dumps({"op": "rebuild"}))
+        await pipe.execute()
+        self._invalidate_cache()
+        self.matcher = None
+        await self._index_for_search(searchable)
+        
+        logger.info(f"Rebuilt knowledge indexes with {len(mapping)} questions")
+        return len(mapping)
+    
+    def _cache_get(self, key):
+        if self.cache is None or not self._ensure_invalidation_listener():
+            return MISSING
+        return self.cache.get(key)
+    
+    def _cache_set(self, key, value, generation):
+        if self.cache is not None and self._invalidation_thread is not None:
+            self.cache.set(key, value, generation)
+    
+    def _invalidate_cache(self):
+        self._changes_seen += 1
+        if self.cache is not None:
+            self.cache.clear()
+    
+    def _invalidate_listings(self):
+        # Usage flushes change counts and order, never questions or answers,
+        # so cached find_answer results stay valid
+        if self.cache is not None:
+            self.cache.invalidate("list", "all")
+    
+    def _ensure_invalidation_listener(self) -> bool:
+        """Subscribe to knowledge:invalidate once; the cache is bypassed until this succeeds."""
+        if self._invalidation_thread is not None:
+            return True
+        
+        with self._listener_lock:
+            if self._invalidation_thread is None:
+                try:
+                    pubsub = self.sync_redis.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(**{"knowledge:invalidate": self._on_invalidate})
+                    # Anything cached before (re)subscribing may have missed messages
+                    self._invalidate_cache()
+                    self._invalidation_thread = pubsub.run_in_thread(
+                        sleep_time=1.0, daemon=True, exception_handler=self._on_listener_error
+                    )
+                except Exception as e:
+                    logger.warning(f"Knowledge cache disabled, cannot subscribe to invalidations: {e}")
+                    return False
+        return True
+    
+    def _on_invalidate(self, message):
+        try:
+            event = json.loads(message["data"])
+        except (TypeError, ValueError):
+            event = {}
+        if event.get("op") == "usage":
+            self._invalidate_listings()
+            return
+        self._invalidate_cache()
+        
+        if self.matcher is None:
+            return
+        if event.get("op") == "add" and event.get("entry"):
+            self._matcher_add(event["entry"])
+        elif event.get("op") == "delete":
+            self._matcher_remove(event.get("id"))
+        else:
+            self.matcher = None
+    
+    def _on_listener_error(self, error, pubsub, thread):
+        logger.warning(f"Knowledge cache invalidation listener stopped: {error}")
+        thread.stop()
+        self._invalidation_thread = None
+        self._invalidate_cache()
+        self.matcher = None
+    
+    async def _get_matcher(self) -> QuestionMatcher:
+        # Subscribe first so no add/delete is missed while loading
+        self._ensure_invalidation_listener()
+        
+        matcher = self.matcher
+        if matcher is not None:
+            return matcher
+        
+        async with self._matcher_lock:
+            while self.matcher is None:
+                changes_seen = self._changes_seen
+                matcher, entries = await self._load_matcher()
+                if changes_seen != self._changes_seen:
+                    continue  # KB changed while loading, the snapshot may be stale
+                self._matcher_entries = entries
+                self.matcher = matcher
+                logger.info(f"Loaded {len(entries)} knowledge base questions into the matcher")
+            return self.matcher
+    
+    async def _load_matcher(self):
+        matcher = QuestionMatcher()
+        entries = {}
+        index_keys = list(await self.redis.smembers("knowledge:index"))
+        for start in range(0, len(index_keys), 500):
+            batch = index_keys[start:start + 500]
+            for key, data in zip(batch, await self.redis.mget(batch)):
+                if not data:
+                    continue
+                try:
+                    entry_data = json.loads(data)
+                    entry_data.setdefault("id", key.split(":", 1)[1])
+                except Exception as e:
+                    logger.warning(f"Skipping invalid KB entry {key}: {e}")
+                    continue
+                entries[entry_data["id"]] = entry_data
+                matcher.add(entry_data["id"], entry_data.get("question", ""))
+        return matcher, entries
+    
+    def _matcher_add(self, entry_data: dict):
+        if self.matcher is not None:
+            self._matcher_entries[entry_data["id"]] = entry_data
+            self.matcher.add(entry_data["id"], entry_data.get("question", ""))
+    
+    def _matcher_remove(self, entry_id: Optional[str]):
+        if self.matcher is not None and entry_id:
+            self._matcher_entries.pop(entry_id, None)
+            self.matcher.remove(entry_id)
+    
+    async def _index_for_search(self, entries: List[KnowledgeBaseEntry]):
+        if self.search is None or not entries:
+            return
+        documents = [(entry.id, entry.question, entry.answer, entry.source) for entry in entries]
+        try:
+            await asyncio.to_thread(self.search.index, KNOWLEDGE, documents)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update the search index for {len(documents)} KB entries: {e}")
+    
+    async def _remove_from_search(self, entry_ids: List[str]):
+        if self.search is None:
+            return
+        try:
+            await asyncio.to_thread(self.search.remove, KNOWLEDGE, entry_ids)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not remove KB entries from the search index: {e}")
+    
+    def _queue_entry_write(self, pipe, entry: KnowledgeBaseEntry):
+        key = f"knowledge:{entry.id}"
+        pipe.set(key, json.dumps(entry.to_dict()))
+        pipe.sadd("knowledge:index", key)
+        pipe.hset("knowledge:question_index", entry.question, entry.id)
+        pipe.zadd("knowledge:created", {entry.id: self._timestamp(entry.created_at)})
+        pipe.zadd("knowledge:last_used", {entry.id: self._timestamp(entry.last_used)}, gt=True)
+    
+    @staticmethod
+    def _batched(iterable, size: int):
+        iterator = iter(iterable)
+        while True:
+            batch = list(itertools.islice(iterator, size))
+            if not batch:
+                return
+            yield batch
+    
+    @staticmethod
+    async def _abatched(aiterable, size: int):
+        batch = []
+        async for item in aiterable:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    async def _fetch_entries(self, entry_ids: List[str]) -> List[KnowledgeBaseEntry]:
+        """Load entries with their usage counters in one pipelined round trip."""
+        if not entry_ids:
+            return []
+        
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.mget([f"knowledge:{entry_id}" for entry_id in entry_ids])
+        pipe.hmget("knowledge:usage", entry_ids)
+        pipe.zmscore("knowledge:last_used", entry_ids)
+        docs, counts, last_used_scores = await pipe.execute()
+        
+        entries = []
+        for entry_id, data, count, last_used_ts in zip(entry_ids, docs, counts, last_used_scores):
+            if not data:
+                continue
+            try:
+                entry = self._dict_to_kb_entry(json.loads(data))
+            except Exception as e:
+                logger.warning(f"Skipping invalid KB entry {entry_id}: {e}")
+                continue
+            self._apply_usage(entry, count, last_used_ts)
+            entries.append(entry)
+        return entries
+    
+    def _apply_usage(self, entry: KnowledgeBaseEntry, count, last_used_ts):
+        """Fold the usage counters (flushed and still buffered) into the entry."""
+        pending_count, pending_ts = self.usage.pending(entry.id)
+        timestamps = [ts for ts in (last_used_ts, pending_ts) if ts is not None]
+        entry.apply_usage(
+            int(count or 0) + pending_count,
+            datetime.utcfromtimestamp(max(timestamps)) if timestamps else None
+        )
+    
+    @staticmethod
+    def _timestamp(value: datetime) -> float:
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    
     def _normalize_question(self, question: str) -> str:
+        # The same key add_entry stores in knowledge:question_index: escaped, then lowercased
         if not question:
             return ""
-        return question.lower().strip()
+        return str(escape(question)).lower().strip()
     
     def _dict_to_kb_entry(self, data: dict) -> KnowledgeBaseEntry:
         try:
@@ -0,0 +1,97 @@
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+from data_version import KNOWLEDGE, queue_bump
+
+logger = logging.getLogger(__name__)
+
+
+class UsageTracker:
+    """Write-behind buffer for knowledge base usage statistics.
+
+    Hits are counted in memory and flushed periodically to Redis as
+    HINCRBY on knowledge:usage and ZADD GT on knowledge:last_used, so the
+    read path never rewrites an entry document. Each flush publishes a
+    ``usage`` invalidation so cached listings pick up the new counts, and
+    calls ``on_flush`` for this process's own cache.
+    """
+
+    def __init__(self, redis_client, flush_interval: float = 5.0, on_flush=None):
+        self.redis = redis_client
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self._counts: Counter = Counter()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def record(self, entry_id: str):
+        with self._lock:
+            self._counts[entry_id] += 1
+            self._last_used[entry_id] = time.time()
+        self._ensure_flusher()
+
+    def pending(self, entry_id: str) -> Tuple[int, Optional[float]]:
+        """Hits for entry_id that have not been flushed yet."""
+        with self._lock:
+            return self._counts.get(entry_id, 0), self._last_used.get(entry_id)
+
+    def discard(self, entry_ids: Iterable[str]):
+        with self._lock:
+            for entry_id in entry_ids:
+                self._counts.pop(entry_id, None)
+                self._last_used.pop(entry_id, None)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                counts, self._counts = self._counts, Counter()
+                last_used, self._last_used = self._last_used, {}
+
+            if not counts:
+                return 0
+
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for entry_id, count in counts.items():
+                    pipe.hincrby("knowledge:usage", entry_id, count)
+                pipe.zadd("knowledge:last_used", last_used, gt=True)
+                # Usage counts and order are shown in the UI
+                queue_bump(pipe, KNOWLEDGE)
+                pipe.publish("knowledge:invalidate", json.dumps({"op": "usage"}))
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Could not flush knowledge base usage, will retry: {e}")
+                with self._lock:
+                    self._counts.update(counts)
+                    for entry_id, ts in last_used.items():
+                        self._last_used[entry_id] = max(ts, self._last_used.get(entry_id, ts))
+                return 0
+
+            if self.on_flush is not None:
+                self.on_flush()
+            return len(counts)
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+    def _ensure_flusher(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="kb-usage-flusher", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
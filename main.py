@@ -4,9 +4,12 @@ import threading
 import webbrowser
 
 from ai_agent.simple_groq_agent import SimpleGroqAgent
+from config import Config
+from help_requests.events import EventConsumer
 from help_requests.service import HelpRequestService
+from help_requests.sweeper import ArchiveSweeper, TimeoutSweeper
 from knowledge_base.service import KnowledgeBaseService
-from supervisor_ui.app import app as ui_app
+from supervisor_ui.app import create_app
 
 logging.basicConfig(
     level=logging.INFO,
@@ -24,13 +27,21 @@ class AISupervisorSystem:
     def __init__(self):
         self.help_service = HelpRequestService()
         self.kb_service = KnowledgeBaseService()
-        self.ai_agent = SimpleGroqAgent()
+        self.ai_agent = SimpleGroqAgent(self.help_service, self.kb_service)
+        self.timeout_sweeper = TimeoutSweeper(self.help_service, Config.HELP_REQUEST_SWEEP_SECONDS)
+        self.archive_sweeper = ArchiveSweeper(self.help_service, Config.ARCHIVE_INTERVAL_SECONDS)
+        # Logs every help request transition, whichever process made it
+        self.request_log = EventConsumer('request-log', self.log_request_event)
         self.ui_thread = None
+        self.ui_url = f'http://localhost:{Config.SUPERVISOR_UI_PORT}'
 
     def start_supervisor_ui(self):
-        """Start the Flask supervisor UI in a separate thread"""
-        logger.info('Starting Supervisor UI on http://localhost:5000')
-        ui_app.run(debug=False, port=5000, host='0.0.0.0', use_reloader=False)
+        """Start the Flask development server for the supervisor UI in a separate thread"""
+        logger.info(f'Starting Supervisor UI on {self.ui_url}')
+        create_app().run(debug=False, port=Config.SUPERVISOR_UI_PORT, host=Config.SUPERVISOR_UI_HOST, use_reloader=False)
+
+    async def log_request_event(self, event_id: str, fields: dict):
+        logger.info(f"Help request {fields.get('request_id')} {fields.get('type')}: {fields.get('question')}")
 
     async def start_ai_agent(self):
         """Start the AI agent"""
@@ -49,12 +60,11 @@ class AISupervisorSystem:
             ('where are you located', 'We are located at 123 Beauty Street, Pleasantville'),
         ]
 
-        for question, answer in sample_knowledge:
-            try:
-                await self.kb_service.add_entry(question, answer, 'initial')
-                logger.info(f'Added sample: {question}')
-            except Exception as e:
-                logger.warning(f'Could not add sample knowledge: {e}')
+        try:
+            counts = await self.kb_service.add_entries(sample_knowledge, source='initial')
+            logger.info(f'Sample knowledge: {counts["added"]} added, {counts["unchanged"]} already present')
+        except Exception as e:
+            logger.warning(f'Could not add sample knowledge: {e}')
 
     async def run(self):
         """Main system runner"""
@@ -62,20 +72,28 @@ class AISupervisorSystem:
 
         await self.initialize_system()
 
-        # Start UI in separate thread
-        self.ui_thread = threading.Thread(target=self.start_supervisor_ui, daemon=True)
-        self.ui_thread.start()
+        # Time out overdue help requests and archive old ones in the background
+        self.timeout_sweeper.start()
+        self.archive_sweeper.start()
+        self.request_log.start()
 
-        await asyncio.sleep(2)
+        if Config.SUPERVISOR_UI_EMBEDDED:
+            # Start UI in separate thread
+            self.ui_thread = threading.Thread(target=self.start_supervisor_ui, daemon=True)
+            self.ui_thread.start()
 
-        try:
-            webbrowser.open('http://localhost:5000')
-        except Exception:
-            logger.info('Supervisor UI: http://localhost:5000')
+            await asyncio.sleep(2)
+
+            try:
+                webbrowser.open(self.ui_url)
+            except Exception:
+                logger.info(f'Supervisor UI: {self.ui_url}')
+        else:
+            logger.info('Supervisor UI not started here; serve it with: gunicorn -c gunicorn.conf.py supervisor_ui.wsgi:app')
 
         logger.info('System is running!')
         logger.info('AI Agent: Ready with Groq')
-        logger.info('Supervisor UI: http://localhost:5000')
+        logger.info(f'Supervisor UI: {self.ui_url}')
 
         await self.start_ai_agent()
 
@@ -0,0 +1,174 @@
+"""
+Process-wide Redis connection pools.
+
+Every service in a process shares one bounded pool per Redis URL instead of
+opening its own with redis.from_url. Asyncio connections belong to the event
+loop that opened them, so async clients get one pool per URL per loop.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional
+
+import redis
+from redis import asyncio as aioredis
+
+from config import Config
+
+_lock = threading.Lock()
+_sync_clients: Dict[str, redis.Redis] = {}
+_async_clients: Dict[str, "weakref.WeakKeyDictionary"] = {}
+
+
+class PoolStats:
+    """Connection checkout counters for one pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.acquired = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def connection_created(self):
+        with self._lock:
+            self.created += 1
+
+    def acquired_after(self, waited: float):
+        with self._lock:
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.acquired += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def released(self):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "created": self.created,
+                "in_use": self.in_use,
+                "idle": max(0, self.created - self.in_use),
+                "peak_in_use": self.peak_in_use,
+                "acquired": self.acquired,
+                "wait_seconds_avg": self.wait_seconds_total / self.acquired if self.acquired else 0.0,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+class _SyncPool(redis.BlockingConnectionPool):
+    def __init__(self, *args, **kwargs):
+        self.stats = PoolStats()
+        super().__init__(*args, **kwargs)
+
+    def make_connection(self):
+        self.stats.connection_created()
+        return super().make_connection()
+
+    def get_connection(self, *args, **kwargs):
+        started = time.perf_counter()
+        connection = super().get_connection(*args, **kwargs)
+        self.stats.acquired_after(time.perf_counter() - started)
+        return connection
+
+    def release(self, connection):
+        self.stats.released()
+        return super().release(connection)
+
+
+class _AsyncPool(aioredis.BlockingConnectionPool):
+    def __init__(self, *args, **kwargs):
+        self.stats = PoolStats()
+        super().__init__(*args, **kwargs)
+
+    def make_connection(self):
+        self.stats.connection_created()
+        return super().make_connection()
+
+    async def get_connection(self, *args, **kwargs):
+        started = time.perf_counter()
+        connection = await super().get_connection(*args, **kwargs)
+        self.stats.acquired_after(time.perf_counter() - started)
+        return connection
+
+    async def release(self, connection):
+        self.stats.released()
+        return await super().release(connection)
+
+
+def _pool_options() -> dict:
+    return {
+        "decode_responses": True,
+        "max_connections": Config.REDIS_MAX_CONNECTIONS,
+        # How long a caller waits for a free connection before giving up
+        "timeout": Config.REDIS_POOL_TIMEOUT_SECONDS,
+        "socket_timeout": Config.REDIS_SOCKET_TIMEOUT_SECONDS,
+        "socket_connect_timeout": Config.REDIS_SOCKET_TIMEOUT_SECONDS,
+        "health_check_interval": Config.REDIS_HEALTH_CHECK_SECONDS,
+    }
+
+
+def get_redis(url: Optional[str] = None) -> redis.Redis:
+    """Blocking client on the shared pool for ``url``, for use outside the event loop."""
+    url = url or Config.REDIS_URL
+    with _lock:
+        client = _sync_clients.get(url)
+        if client is None:
+            client = redis.Redis(connection_pool=_SyncPool.from_url(url, **_pool_options()))
+            _sync_clients[url] = client
+        return client
+
+
+def get_async_redis(url: Optional[str] = None) -> aioredis.Redis:
+    """Asyncio client on the shared pool for ``url`` and the running event loop."""
+    url = url or Config.REDIS_URL
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(url, weakref.WeakKeyDictionary())
+        client = clients.get(loop)
+        if client is None:
+            client = aioredis.Redis(connection_pool=_AsyncPool.from_url(url, **_pool_options()))
+            clients[loop] = client
+        return client
+
+
+async def close_async_clients(loop: Optional[asyncio.AbstractEventLoop] = None):
+    """Disconnect and forget the async pools opened on ``loop`` (default: the running loop).
+
+    Call before closing a loop; its connections cannot be used from any other.
+    """
+    loop = loop or asyncio.get_running_loop()
+    with _lock:
+        clients = [clients.pop(loop) for clients in _async_clients.values() if loop in clients]
+    for client in clients:
+        await client.connection_pool.disconnect()
+
+
+def pool_stats() -> List[dict]:
+    """Usage counters for every pool opened in this process."""
+    with _lock:
+        pools = [("sync", url, client.connection_pool) for url, client in _sync_clients.items()]
+        for url, clients in _async_clients.items():
+            pools.extend(("async", url, client.connection_pool) for client in clients.values())
+
+    stats = []
+    for kind, url, pool in pools:
+        snapshot = pool.stats.snapshot()
+        snapshot.update({"kind": kind, "url": _redact(url), "max_connections": pool.max_connections})
+        stats.append(snapshot)
+    return stats
+
+
+def _redact(url: str) -> str:
+    # Keep passwords out of the stats output
+    scheme, sep, rest = url.partition("://")
+    if "@" in rest:
+        rest = "***@" + rest.split("@", 1)[1]
+    return scheme + sep + rest
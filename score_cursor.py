@@ -0,0 +1,60 @@
+"""
+Keyset paging over Redis sorted sets, highest score first.
+
+A cursor is ``"<score>:<member>"`` for the last row of a page. The next page
+is read with ZREVRANGEBYSCORE from that score *inclusive*, skipping the
+members already shown, so rows that share a score are never dropped between
+pages the way an exclusive ``(score`` bound would drop them. Cursors are
+opaque to callers: pass back what a listing returned, nothing else.
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+Position = Tuple[float, Optional[str]]
+
+
+def encode_cursor(member: str, score: float) -> str:
+    return f"{score!r}:{member}"
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Position]:
+    """``(score, member)`` for a cursor, None for no cursor.
+
+    Raises ValueError for anything that is not a cursor we handed out. A bare
+    score (older cursors) gives a None member and an exclusive bound.
+    """
+    if not cursor:
+        return None
+    score, _, member = cursor.partition(":")
+    try:
+        value = float(score)
+    except ValueError:
+        raise ValueError(f"Malformed cursor: {cursor!r}") from None
+    if not math.isfinite(value):
+        raise ValueError(f"Malformed cursor: {cursor!r}")
+    return value, member or None
+
+
+async def rows_after(redis, key: str, after: Optional[Position], count: int,
+                     max_score="+inf", min_score="-inf") -> List[Tuple[str, float]]:
+    """Up to ``count`` (member, score) rows of ``key`` past the position ``after``.
+
+    ``max_score`` bounds the first page only; later pages start at the cursor.
+    """
+    if after is not None:
+        max_score = repr(after[0]) if after[1] is not None else f"({after[0]!r}"
+
+    rows = []
+    start = 0
+    while len(rows) < count:
+        fetched = await redis.zrevrangebyscore(key, max_score, min_score, start=start, num=count, withscores=True)
+        start += len(fetched)
+        # ZREVRANGEBYSCORE orders ties by member, descending
+        rows.extend(
+            (member, score) for member, score in fetched
+            if after is None or after[1] is None or score < after[0] or member < after[1]
+        )
+        if len(fetched) < count:
+            break
+    return rows[:count]
@@ -0,0 +1,202 @@
+"""
+Full-text search over help requests and knowledge base entries.
+
+A SQLite FTS5 index kept next to the Redis data. The help request and
+knowledge base services update it on every write, so it also covers
+requests that have since moved to the archive. Every service in a process
+shares one index per database path; a forked worker opens its own.
+"""
+
+import html
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+
+# Document kinds
+HELP_REQUEST = "help_request"
+KNOWLEDGE = "knowledge"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_documents (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT '',
+    updated_at REAL NOT NULL,
+    UNIQUE (kind, doc_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_text USING fts5(question, answer, tokenize='porter unicode61');
+"""
+
+_WORD_RE = re.compile(r"\w+")
+
+_lock = threading.Lock()
+_indexes: Dict[str, "SearchIndex"] = {}
+
+
+class SearchIndex:
+    """Inverted index of question and answer text, ranked by BM25.
+
+    Rows of search_text share their rowid with search_documents, which maps
+    them back to a help request or knowledge entry id. Matches in the
+    question weigh twice as much as matches in the answer.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=Config.SQLITE_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def index(self, kind: str, documents: Iterable[Tuple[str, str, str, str]]) -> int:
+        """Add or replace ``(doc_id, question, answer, status)`` documents in one transaction.
+
+        ``status`` is the request status for help requests and the source for
+        knowledge entries.
+        """
+        documents = list(documents)
+        if not documents:
+            return 0
+        now = time.time()
+        with self._lock, self._conn:
+            for doc_id, question, answer, status in documents:
+                row = self._conn.execute(
+                    "SELECT id FROM search_documents WHERE kind = ? AND doc_id = ?", (kind, doc_id)
+                ).fetchone()
+                if row:
+                    rowid = row[0]
+                    self._conn.execute(
+                        "UPDATE search_documents SET status = ?, updated_at = ? WHERE id = ?",
+                        (status or "", now, rowid)
+                    )
+                    self._conn.execute("DELETE FROM search_text WHERE rowid = ?", (rowid,))
+                else:
+                    rowid = self._conn.execute(
+                        "INSERT INTO search_documents (kind, doc_id, status, updated_at) VALUES (?, ?, ?, ?)",
+                        (kind, doc_id, status or "", now)
+                    ).lastrowid
+                self._conn.execute(
+                    "INSERT INTO search_text (rowid, question, answer) VALUES (?, ?, ?)",
+                    (rowid, self._plain(question), self._plain(answer))
+                )
+        return len(documents)
+
+    def set_status(self, kind: str, statuses: Dict[str, str]):
+        """Update the status of indexed documents whose text did not change."""
+        if not statuses:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE search_documents SET status = ?, updated_at = ? WHERE kind = ? AND doc_id = ?",
+                [(status, now, kind, doc_id) for doc_id, status in statuses.items()]
+            )
+
+    def remove(self, kind: str, doc_ids: Iterable[str]) -> int:
+        removed = 0
+        with self._lock, self._conn:
+            for doc_id in doc_ids:
+                row = self._conn.execute(
+                    "SELECT id FROM search_documents WHERE kind = ? AND doc_id = ?", (kind, doc_id)
+                ).fetchone()
+                if not row:
+                    continue
+                self._conn.execute("DELETE FROM search_text WHERE rowid = ?", row)
+                self._conn.execute("DELETE FROM search_documents WHERE id = ?", row)
+                removed += 1
+        return removed
+
+    def search(
+        self,
+        query: str,
+        kind: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> Tuple[List[dict], Optional[int]]:
+        """Best matches first, as dicts with kind, id, question, answer, status and score.
+
+        Every word of ``query`` must match; the last one also matches as a
+        prefix so results follow the supervisor's typing. The second element
+        is the offset of the next page, or None on the last page.
+        """
+        expression = self._match_expression(query)
+        if not expression:
+            return [], None
+        offset = max(0, offset)
+
+        sql = (
+            "SELECT d.kind, d.doc_id, t.question, t.answer, d.status, bm25(search_text, 2.0, 1.0) AS rank "
+            "FROM search_text t JOIN search_documents d ON d.id = t.rowid "
+            "WHERE search_text MATCH ?"
+        )
+        params = [expression]
+        if kind:
+            sql += " AND d.kind = ?"
+            params.append(kind)
+        # Ask for one extra row to know whether another page exists
+        sql += " ORDER BY rank LIMIT ? OFFSET ?"
+        params.extend([limit + 1, offset])
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        hits = [
+            {"kind": row[0], "id": row[1], "question": row[2], "answer": row[3], "status": row[4], "score": -row[5]}
+            for row in rows[:limit]
+        ]
+        return hits, offset + limit if len(rows) > limit else None
+
+    def count(self, kind: Optional[str] = None) -> int:
+        with self._lock:
+            if kind:
+                return self._conn.execute("SELECT COUNT(*) FROM search_documents WHERE kind = ?", (kind,)).fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM search_documents").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _plain(text: Optional[str]) -> str:
+        # Stored text is HTML-escaped by the services
+        return html.unescape(text or "")
+
+    @staticmethod
+    def _match_expression(query: str) -> str:
+        words = _WORD_RE.findall(html.unescape(query or "").lower())
+        if not words:
+            return ""
+        # Quoting keeps FTS5 operators typed by the user from being parsed
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += "*"
+        return " ".join(terms)
+
+
+def _forget_indexes():
+    # SQLite connections must not be used across fork(); the child reconnects
+    global _lock
+    _lock = threading.Lock()
+    _indexes.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_indexes)
+
+
+def get_search_index(path: Optional[str] = None) -> Optional[SearchIndex]:
+    """Shared index for ``path`` (default SEARCH_DB_PATH), or None when search is disabled."""
+    path = Config.SEARCH_DB_PATH if path is None else path
+    if not path:
+        return None
+    with _lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = SearchIndex(path)
+        return index
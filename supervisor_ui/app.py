@@ -1,70 +1,229 @@
-﻿from flask import Flask, render_template, request, jsonify, redirect, url_for
-import asyncio
+﻿from flask import Blueprint, Flask, Response, current_app, g, render_template, request, jsonify, redirect, url_for
+from werkzeug.local import LocalProxy
+import groq
 import logging
+import queue
+import re
+import time
 import uuid
 from datetime import datetime
+from config import Config
+from data_version import HELP_REQUESTS as HELP_REQUESTS_DATA, KNOWLEDGE as KNOWLEDGE_DATA
+from help_requests.models import StatusConflict
 from help_requests.service import HelpRequestService
 from knowledge_base.service import KnowledgeBaseService
 from ai_agent.simple_groq_agent import SimpleGroqAgent
+from redis_pool import pool_stats
+from search_index import HELP_REQUEST, KNOWLEDGE, get_search_index
+from supervisor_ui.async_bridge import bridge_stats, run_async, submit_async
+from supervisor_ui.live_updates import EventBroadcaster, format_event
+from supervisor_ui.page_cache import PageCache, conditional
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create the Flask app instance
-app = Flask(__name__)
+ui = Blueprint('supervisor_ui', __name__)
 
-# Initialize services
-help_service = HelpRequestService()
-kb_service = KnowledgeBaseService()
-ai_agent = SimpleGroqAgent()
 
-def run_async(coro):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    return loop.run_until_complete(coro)
+class WorkerResources:
+    """Services, feeds and caches of one app, built in the process that serves it.
+    
+    Nothing here is shared between worker processes: each opens its own
+    Redis pools, event loop, search index connection and page cache. The
+    data they serve lives in Redis, so workers stay consistent without
+    talking to each other.
+    """
+    
+    def __init__(self):
+        self.help_service = HelpRequestService()
+        self.kb_service = KnowledgeBaseService()
+        self.search_index = get_search_index()
+        # Agents are per request (see _request_agent); they share this client
+        self.groq_client = groq.AsyncGroq(api_key=Config.GROQ_API_KEY)
+        # Pushes changes to open dashboards over /events
+        self.broadcaster = EventBroadcaster(
+            self.help_service, self.kb_service, submit_async, max_subscribers=Config.SUPERVISOR_UI_MAX_STREAMS
+        )
+        # ETag/Last-Modified and rendered pages, keyed on the data versions
+        self.page_cache = PageCache(run_async, self.help_service.redis_url,
+                                    Config.PAGE_CACHE_SIZE, Config.PAGE_VERSION_TTL_SECONDS)
+
+
+def create_app() -> Flask:
+    """Build the supervisor UI; call once per worker process (see gunicorn.conf.py)."""
+    app = Flask(__name__)
+    resources = WorkerResources()
+    app.extensions['supervisor_ui'] = resources
+    resources.page_cache.init_app(app)
+    app.register_blueprint(ui)
+    return app
+
+
+def _resources() -> WorkerResources:
+    return current_app.extensions['supervisor_ui']
+
+
+def _request_agent() -> SimpleGroqAgent:
+    # A fresh agent per request, so one caller's conversation never leaks into another's
+    if 'ai_agent' not in g:
+        resources = _resources()
+        g.ai_agent = SimpleGroqAgent(resources.help_service, resources.kb_service, resources.groq_client)
+    return g.ai_agent
 
-@app.route('/')
+
+help_service = LocalProxy(lambda: _resources().help_service)
+kb_service = LocalProxy(lambda: _resources().kb_service)
+ai_agent = LocalProxy(_request_agent)
+
+KNOWLEDGE_PAGE_SIZE = 20
+RESOLVED_PAGE_SIZE = 50
+PENDING_PAGE_SIZE = 50
+# Newest pending requests on the dashboard; the rest are on /requests
+DASHBOARD_PENDING_LIMIT = 20
+API_MAX_PAGE_SIZE = 200
+# Largest batch for resolve-batch / unresolved-batch; all ids are WATCHed in one transaction
+BATCH_MAX_REQUESTS = 500
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+# Comment line sent to idle /events streams so proxies keep them open
+EVENTS_KEEPALIVE_SECONDS = 15
+# A reconnecting browser further behind than this reloads the page instead
+EVENTS_REPLAY_MAX = 500
+# Redis stream ids, e.g. 1700000000000-0
+EVENT_ID_RE = re.compile(r'^\d+-\d+$')
+
+@ui.route('/')
+@conditional(HELP_REQUESTS_DATA, KNOWLEDGE_DATA)
 def dashboard():
     try:
-        pending_requests = run_async(help_service.get_pending_requests())
-        resolved_requests = run_async(help_service.get_resolved_requests())[:5]
+        pending_requests, pending_cursor = run_async(help_service.list_pending(limit=DASHBOARD_PENDING_LIMIT))
+        resolved_requests, _ = run_async(help_service.list_resolved(limit=5))
+        request_stats = run_async(help_service.get_stats())
         
         # Safely get knowledge entries
         try:
-            knowledge_entries = run_async(kb_service.get_all_entries())[:5]
+            knowledge_entries, _ = run_async(kb_service.list_entries(limit=5))
+            knowledge_count = run_async(kb_service.count_entries())
         except Exception as e:
             logger.warning(f"Could not load knowledge entries: {e}")
             knowledge_entries = []
+            knowledge_count = 0
         
         stats = {
-            'pending': len(pending_requests),
-            'resolved': len(resolved_requests),
-            'knowledge_entries': len(knowledge_entries)
+            'pending': request_stats['pending'],
+            'resolved': request_stats['resolved'],
+            'knowledge_entries': knowledge_count
         }
         
         return render_template('dashboard.html', 
                              pending_requests=pending_requests,
+                             more_pending=pending_cursor is not None,
                              resolved_requests=resolved_requests,
                              knowledge_entries=knowledge_entries,
                              stats=stats)
     except Exception as e:
         logger.error(f"Error loading dashboard: {e}")
-        return render_template('error.html', error=str(e))
+        return render_template('error.html', error=str(e)), 500
 
-@app.route('/requests')
+@ui.route('/events')
+def live_events():
+    """Server-Sent Events: help request transitions, knowledge changes and fresh counts"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    # The stream outlives the request context, so hold on to this worker's broadcaster
+    broadcaster = _resources().broadcaster
+    # Each open stream holds a worker thread (see live_updates)
+    subscriber = broadcaster.subscribe()
+    if subscriber is None:
+        return Response('Too many open event streams\n', status=503, headers={'Retry-After': '30'})
+    
+    def stream():
+        yield 'retry: 3000\n\n'
+        if last_event_id:
+            # Browser reconnected: send what it missed. Events that also
+            # arrive through the subscription are applied idempotently.
+            missed = None
+            if EVENT_ID_RE.match(last_event_id):
+                try:
+                    missed = run_async(broadcaster.replay(last_event_id, EVENTS_REPLAY_MAX))
+                except Exception as e:
+                    logger.warning(f"Could not replay dashboard events after {last_event_id}: {e}")
+            if missed is None or len(missed) >= EVENTS_REPLAY_MAX:
+                # Unknown position or too far behind: the page starts over
+                yield format_event('refresh', {})
+                return
+            yield from missed
+        deadline = time.monotonic() + Config.EVENTS_MAX_STREAM_SECONDS
+        while not subscriber.closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Hand the thread back; the browser reconnects after the retry delay
+                return
+            try:
+                yield subscriber.queue.get(timeout=min(EVENTS_KEEPALIVE_SECONDS, remaining))
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+    
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # Also runs when the client leaves before the first chunk is sent
+    response.call_on_close(lambda: broadcaster.unsubscribe(subscriber))
+    return response
+
+@ui.route('/requests')
+@conditional(HELP_REQUESTS_DATA)
 def all_requests():
+    cursor = request.args.get('cursor')
     try:
-        pending_requests = run_async(help_service.get_pending_requests())
-        resolved_requests = run_async(help_service.get_resolved_requests())
+        # First pages only; the template loads the rest from /api/requests
+        pending_requests, pending_cursor = run_async(help_service.list_pending(limit=PENDING_PAGE_SIZE))
+        pending_count = run_async(help_service.get_stats())['pending']
+        # History pages continue from Redis into the SQLite archive
+        resolved_requests, next_cursor = run_async(help_service.list_resolved(
+            limit=RESOLVED_PAGE_SIZE, cursor=cursor
+        ))
         
         return render_template('all_requests.html', 
                              pending_requests=pending_requests,
-                             resolved_requests=resolved_requests)
+                             pending_count=pending_count,
+                             pending_cursor=pending_cursor,
+                             resolved_requests=resolved_requests,
+                             cursor=cursor,
+                             next_cursor=next_cursor)
+    except ValueError as e:
+        return render_template('error.html', error=str(e)), 400
     except Exception as e:
         logger.error(f"Error loading requests: {e}")
-        return render_template('error.html', error=str(e))
+        return render_template('error.html', error=str(e)), 500
+
+@ui.route('/api/requests')
+@conditional(HELP_REQUESTS_DATA)
+def list_requests_api():
+    """One page of pending or resolved requests, for lazy loading"""
+    status = request.args.get('status', 'pending')
+    cursor = request.args.get('cursor') or None
+    limit = min(max(1, request.args.get('limit', RESOLVED_PAGE_SIZE, type=int)), API_MAX_PAGE_SIZE)
+    try:
+        if status == 'pending':
+            requests, next_cursor = run_async(help_service.list_pending(limit=limit, cursor=cursor))
+        elif status == 'resolved':
+            # Every terminal status, newest resolution first
+            requests, next_cursor = run_async(help_service.list_resolved(limit=limit, cursor=cursor))
+        else:
+            return jsonify({'error': f'Unknown status: {status}'}), 400
+        return jsonify({
+            'items': [help_request.to_dict() for help_request in requests],
+            'next_cursor': next_cursor
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error listing {status} requests: {e}")
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/request/<request_id>')
+@ui.route('/request/<request_id>')
+@conditional(HELP_REQUESTS_DATA)
 def view_request(request_id):
     try:
         help_request = run_async(help_service.get_help_request(request_id))
@@ -76,7 +235,7 @@ def view_request(request_id):
         logger.error(f"Error loading request {request_id}: {e}")
         return render_template('error.html', error=str(e)), 500
 
-@app.route('/request/<request_id>/respond', methods=['POST'])
+@ui.route('/request/<request_id>/respond', methods=['POST'])
 def respond_to_request(request_id):
     try:
         answer = request.form.get('answer')
@@ -84,21 +243,20 @@ def respond_to_request(request_id):
             return render_template('error.html', error='Answer required'), 400
         
         # Resolve the request
-        help_request = run_async(help_service.resolve_request(request_id, answer))
+        run_async(help_service.resolve_request(request_id, answer))
         
-        # Add to knowledge base
-        run_async(kb_service.add_entry(help_request.question, answer, 'supervisor'))
-        
-        # Notify AI agent
+        # The agent adds the answer to the knowledge base and texts the customers
         run_async(ai_agent.handle_supervisor_response(request_id, answer))
         
-        return redirect(url_for('view_request', request_id=request_id))
+        return redirect(url_for('.view_request', request_id=request_id))
     
+    except StatusConflict as e:
+        return render_template('error.html', error=str(e)), 409
     except Exception as e:
         logger.error(f"Error responding to request {request_id}: {e}")
         return render_template('error.html', error=str(e)), 500
 
-@app.route('/api/requests/<request_id>/resolve', methods=['POST'])
+@ui.route('/api/requests/<request_id>/resolve', methods=['POST'])
 def resolve_request(request_id):
     try:
         answer = request.json.get('answer')
@@ -107,8 +265,7 @@ def resolve_request(request_id):
         
         help_request = run_async(help_service.resolve_request(request_id, answer))
         
-        run_async(kb_service.add_entry(help_request.question, answer, 'supervisor'))
-        
+        # Adds the answer to the knowledge base and texts the customers
         run_async(ai_agent.handle_supervisor_response(request_id, answer))
         
         return jsonify({
@@ -117,30 +274,112 @@ def resolve_request(request_id):
             'message': 'Request resolved and customer notified'
         })
     
+    except StatusConflict as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         logger.error(f"Error resolving request {request_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/requests/<request_id>/unresolved', methods=['POST'])
+def _batch_request_ids():
+    request_ids = (request.json or {}).get('request_ids')
+    if not isinstance(request_ids, list) or not request_ids:
+        return None, (jsonify({'error': 'request_ids required'}), 400)
+    if len(request_ids) > BATCH_MAX_REQUESTS:
+        return None, (jsonify({'error': f'At most {BATCH_MAX_REQUESTS} requests per batch'}), 400)
+    return [str(request_id) for request_id in request_ids], None
+
+@ui.route('/api/requests/resolve-batch', methods=['POST'])
+def resolve_batch():
+    """Resolve many requests with one answer: one transaction, one knowledge base write"""
+    try:
+        request_ids, error = _batch_request_ids()
+        if error:
+            return error
+        answer = request.json.get('answer')
+        if not answer:
+            return jsonify({'error': 'Answer required'}), 400
+        
+        resolved, missing, conflicts = run_async(help_service.resolve_many(request_ids, answer))
+        if resolved:
+            run_async(ai_agent.handle_batch_response(resolved, answer))
+        
+        return jsonify({
+            'success': True,
+            'resolved': [help_request.id for help_request in resolved],
+            'missing': missing,
+            'conflicts': [help_request.id for help_request in conflicts],
+            'message': f'{len(resolved)} requests resolved and customers notified'
+        })
+    
+    except Exception as e:
+        logger.error(f"Error resolving request batch: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@ui.route('/api/requests/unresolved-batch', methods=['POST'])
+def mark_unresolved_batch():
+    try:
+        request_ids, error = _batch_request_ids()
+        if error:
+            return error
+        updated, missing, conflicts = run_async(help_service.mark_many_unresolved(request_ids))
+        return jsonify({
+            'success': True,
+            'updated': [help_request.id for help_request in updated],
+            'missing': missing,
+            'conflicts': [help_request.id for help_request in conflicts]
+        })
+    
+    except Exception as e:
+        logger.error(f"Error marking request batch as unresolved: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@ui.route('/api/requests/<request_id>/unresolved', methods=['POST'])
 def mark_unresolved(request_id):
     try:
         help_request = run_async(help_service.mark_request_unresolved(request_id))
         return jsonify({'success': True, 'request': help_request.to_dict()})
     
+    except StatusConflict as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         logger.error(f"Error marking request {request_id} as unresolved: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/knowledge')
+@ui.route('/knowledge')
+@conditional(KNOWLEDGE_DATA)
 def knowledge_base():
+    cursor = request.args.get('cursor')
+    order = request.args.get('order', 'last_used')
     try:
-        entries = run_async(kb_service.get_all_entries())
-        return render_template('knowledge_base.html', entries=entries)
+        entries, next_cursor = run_async(kb_service.list_entries(
+            limit=KNOWLEDGE_PAGE_SIZE, order=order, cursor=cursor
+        ))
+        return render_template('knowledge_base.html', entries=entries, order=order,
+                               cursor=cursor, next_cursor=next_cursor)
+    except ValueError as e:
+        return render_template('error.html', error=str(e)), 400
     except Exception as e:
         logger.error(f"Error loading knowledge base: {e}")
-        return render_template('knowledge_base.html', entries=[])
+        return render_template('knowledge_base.html', entries=[], order=order,
+                               cursor=cursor, next_cursor=None), 500
+
+@ui.route('/api/knowledge')
+@conditional(KNOWLEDGE_DATA)
+def list_knowledge_api():
+    """One page of knowledge entries, for lazy loading"""
+    cursor = request.args.get('cursor')
+    order = request.args.get('order', 'last_used')
+    limit = min(max(1, request.args.get('limit', KNOWLEDGE_PAGE_SIZE, type=int)), API_MAX_PAGE_SIZE)
+    try:
+        entries, next_cursor = run_async(kb_service.list_entries(limit=limit, order=order, cursor=cursor))
+        return jsonify({'items': [entry.to_dict() for entry in entries], 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error listing knowledge entries: {e}")
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/api/knowledge/<entry_id>/delete', methods=['POST'])
+@ui.route('/api/knowledge/<entry_id>/delete', methods=['POST'])
 def delete_knowledge_entry(entry_id):
     try:
         success = run_async(kb_service.delete_entry(entry_id))
@@ -153,7 +392,30 @@ def delete_knowledge_entry(entry_id):
         logger.error(f"Error deleting knowledge entry {entry_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/simulate-call', methods=['POST'])
+@ui.route('/api/search')
+def search():
+    """Ranked full-text search over help requests and knowledge entries"""
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('kind') or None
+    cursor = request.args.get('cursor', 0, type=int)
+    limit = min(max(1, request.args.get('limit', SEARCH_PAGE_SIZE, type=int)), SEARCH_MAX_PAGE_SIZE)
+    search_index = _resources().search_index
+    
+    if search_index is None:
+        return jsonify({'error': 'Search is disabled (SEARCH_DB_PATH is empty)'}), 503
+    if not query:
+        return jsonify({'error': 'Query required'}), 400
+    if kind not in (None, HELP_REQUEST, KNOWLEDGE):
+        return jsonify({'error': f'Unknown kind: {kind}'}), 400
+    
+    try:
+        hits, next_cursor = search_index.search(query, kind=kind, offset=cursor, limit=limit)
+        return jsonify({'query': query, 'hits': hits, 'next_cursor': next_cursor})
+    except Exception as e:
+        logger.error(f"Error searching for {query!r}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@ui.route('/simulate-call', methods=['POST'])
 def simulate_call():
     try:
         question = request.json.get('question', 'Do you offer keratin treatments?')
@@ -183,7 +445,7 @@ def simulate_call():
         return jsonify({'error': str(e)}), 500
 
 # NEW ROUTE: Create help request directly without AI
-@app.route('/create-help-request', methods=['POST'])
+@ui.route('/create-help-request', methods=['POST'])
 def create_help_request():
     """Create a help request directly"""
     try:
@@ -210,11 +472,11 @@ def create_help_request():
         return jsonify({'error': str(e)}), 500
 
 # DEBUG ROUTES - Add these for troubleshooting
-@app.route('/debug-routes')
+@ui.route('/debug-routes')
 def debug_routes():
     """Debug page to see all available routes"""
     routes = []
-    for rule in app.url_map.iter_rules():
+    for rule in current_app.url_map.iter_rules():
         routes.append({
             'endpoint': rule.endpoint,
             'methods': list(rule.methods),
@@ -227,12 +489,12 @@ def debug_routes():
     html += "</ul>"
     return html
 
-@app.route('/debug-requests')
+@ui.route('/debug-requests')
 def debug_requests():
     """Debug page to see all available requests"""
     try:
-        pending_requests = run_async(help_service.get_pending_requests())
-        resolved_requests = run_async(help_service.get_resolved_requests())
+        pending_requests, _ = run_async(help_service.list_pending(limit=10))
+        resolved_requests, _ = run_async(help_service.list_resolved(limit=10))
         
         html = "<h1>Available Requests:</h1>"
         
@@ -242,7 +504,7 @@ def debug_requests():
         html += "</ul>"
         
         html += "<h2>Resolved Requests:</h2><ul>"
-        for req in resolved_requests[:10]:  # Show first 10
+        for req in resolved_requests:
             html += f"<li><a href='/request/{req.id}'>{req.id[:8]} - {req.question[:50]}...</a></li>"
         html += "</ul>"
         
@@ -250,7 +512,22 @@ def debug_requests():
     except Exception as e:
         return f"Error loading requests: {str(e)}"
 
-@app.route('/test-request')
+@ui.route('/debug-redis-pool')
+def debug_redis_pool():
+    """Connection pool usage, for sizing REDIS_MAX_CONNECTIONS under load"""
+    return jsonify(pool_stats())
+
+@ui.route('/debug-page-cache')
+def debug_page_cache():
+    """Rendered-page cache hits and 304s served from the data versions"""
+    return jsonify(_resources().page_cache.stats())
+
+@ui.route('/debug-async-bridge')
+def debug_async_bridge():
+    """Call counts and latency of coroutines run on the UI's background event loop"""
+    return jsonify(bridge_stats())
+
+@ui.route('/test-request')
 def test_request():
     """Test if request detail template works with mock data"""
     from datetime import datetime
@@ -266,7 +543,7 @@ def test_request():
     
     return render_template('request_detail.html', request=MockRequest())
 
-@app.route('/api/markdown', methods=['POST'])
+@ui.route('/api/markdown', methods=['POST'])
 def render_markdown():
     """API endpoint for markdown preview"""
     try:
@@ -280,4 +557,4 @@ def render_markdown():
 if __name__ == '__main__':
     logger.info("Starting Supervisor UI on http://localhost:5000")
     logger.info("Using Groq AI Agent - ALL questions will create help requests")
-    app.run(debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
+    create_app().run(debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
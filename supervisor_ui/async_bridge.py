@@ -0,0 +1,156 @@
+"""
+Run the async services from synchronous Flask views.
+
+One event loop lives in a background thread for the whole process and every
+view submits its coroutines to it. The services' asyncio Redis connections
+belong to that loop, so they are reused across requests instead of being
+opened (and leaked) by a fresh loop per call.
+
+The loop thread does not survive fork(), so a worker forked from a process
+that already started it begins with no loop and starts its own on first use.
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from redis_pool import close_async_clients
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBridge:
+    """Owns the background loop thread; ``run`` blocks until a coroutine finishes."""
+
+    def __init__(self, name: str = "async-bridge", timeout: Optional[float] = None):
+        self.name = name
+        # Default wait for a result; None waits for as long as the coroutine runs
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._calls = 0
+        self._errors = 0
+        self._in_flight = 0
+        self._seconds_total = 0.0
+        self._seconds_max = 0.0
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run_loop, args=(loop, ready), name=self.name, daemon=True
+                )
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run ``coro`` on the background loop and return its result (or raise its error)."""
+        loop = self._loop or self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        started = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+        failed = False
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except BaseException:
+            failed = True
+            future.cancel()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._in_flight -= 1
+                self._calls += 1
+                if failed:
+                    self._errors += 1
+                self._seconds_total += elapsed
+                self._seconds_max = max(self._seconds_max, elapsed)
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule ``coro`` on the background loop without waiting for it."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop or self.start())
+
+    def stop(self, timeout: float = 5.0):
+        """Cancel outstanding work, close this loop's Redis connections and stop the thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Event loop {self.name} did not shut down cleanly: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not thread.is_alive():
+            loop.close()
+
+    def forget(self):
+        """Drop the loop without stopping it; for a forked child, where its thread does not exist."""
+        self._lock = threading.Lock()
+        self._loop = self._thread = None
+        self._calls = self._errors = self._in_flight = 0
+        self._seconds_total = self._seconds_max = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._loop is not None,
+                "calls": self._calls,
+                "errors": self._errors,
+                "in_flight": self._in_flight,
+                "seconds_avg": self._seconds_total / self._calls if self._calls else 0.0,
+                "seconds_max": self._seconds_max,
+            }
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop, ready: threading.Event):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    async def _shutdown(self):
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await close_async_clients(asyncio.get_running_loop())
+        await asyncio.get_running_loop().shutdown_asyncgens()
+
+
+_bridge = AsyncBridge(name="supervisor-ui-loop")
+atexit.register(_bridge.stop)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_bridge.forget)
+
+
+def run_async(coro, timeout: Optional[float] = None):
+    """Run a service coroutine from a Flask view on the shared background loop."""
+    return _bridge.run(coro, timeout)
+
+
+def submit_async(coro) -> concurrent.futures.Future:
+    """Start a long-running coroutine (such as a feed reader) on the shared background loop."""
+    return _bridge.submit(coro)
+
+
+def bridge_stats() -> dict:
+    return _bridge.stats()
+
+
+def shutdown():
+    _bridge.stop()
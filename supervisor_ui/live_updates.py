@@ -0,0 +1,165 @@
+"""
+Server-Sent Events feed for the supervisor dashboard.
+
+One broadcaster per process reads the help request event stream and the
+knowledge:invalidate channel and fans each change out to every open
+dashboard. Redis sees the same load whether one tab or fifty are open; each
+tab only costs a queue and the thread serving its response.
+
+That thread is the real cost: under gunicorn's gthread workers an open
+stream holds one of the worker's SUPERVISOR_UI_THREADS threads for as long
+as it stays open. Streams are capped per worker (SUPERVISOR_UI_MAX_STREAMS)
+so page views always keep threads of their own, and each stream ends after
+EVENTS_MAX_STREAM_SECONDS; the browser then reconnects with Last-Event-ID.
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import threading
+from typing import List, Optional, Tuple
+
+from help_requests.events import EVENTS_STREAM, read_events
+from redis_pool import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscriber:
+    """One open /events response. Dropped, and left to reconnect, if it falls too far behind."""
+
+    def __init__(self, max_pending: int):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.closed = False
+
+
+class EventBroadcaster:
+    """Fans help request and knowledge base changes out to SSE subscribers.
+
+    Messages are formatted once and shared by every subscriber. Request
+    events carry their stream id, so a reconnecting browser can resume from
+    Last-Event-ID. Every batch of changes is followed by a ``stats`` event
+    with fresh dashboard counts.
+    """
+
+    def __init__(self, help_service, kb_service, submit, max_pending: int = 256, block_ms: int = 2000,
+                 max_subscribers: int = 0):
+        self.help_service = help_service
+        self.kb_service = kb_service
+        # Schedules a coroutine on the UI's background loop
+        self._submit = submit
+        self.max_pending = max_pending
+        # 0 means no limit
+        self.max_subscribers = max_subscribers
+        # Bounded by REDIS_SOCKET_TIMEOUT_SECONDS (see config)
+        self.block_ms = block_ms
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscriber] = []
+        self._futures = []
+
+    def subscribe(self) -> Optional[Subscriber]:
+        """A new subscriber, or None when ``max_subscribers`` streams are already open."""
+        subscriber = Subscriber(self.max_pending)
+        with self._lock:
+            if self.max_subscribers and len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.append(subscriber)
+            # Start the feeds with the first subscriber, and again if the loop was restarted
+            if not self._futures or any(future.done() for future in self._futures):
+                for future in self._futures:
+                    future.cancel()
+                self._futures = [self._submit(self._pump_requests()), self._submit(self._pump_knowledge())]
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscriber.closed = True
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, message: str):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except queue.Full:
+                logger.info("Dropping a slow dashboard event subscriber")
+                self.unsubscribe(subscriber)
+
+    async def replay(self, after_id: str, count: int = 500) -> List[str]:
+        """Request events logged after ``after_id``, for a browser resuming with Last-Event-ID."""
+        entries = await read_events(after_id, count, self.help_service.redis_url)
+        return [format_event("request", fields, event_id) for event_id, fields in entries]
+
+    async def _pump_requests(self):
+        redis = get_async_redis(self.help_service.redis_url)
+        last_id = None
+        while True:
+            try:
+                if last_id is None:
+                    latest = await redis.xrevrange(EVENTS_STREAM, count=1)
+                    last_id = latest[0][0] if latest else "0-0"
+                response = await redis.xread({EVENTS_STREAM: last_id}, count=100, block=self.block_ms)
+                if not response:
+                    continue
+                entries: List[Tuple[str, dict]] = response[0][1]
+                for event_id, fields in entries:
+                    self.publish(format_event("request", fields, event_id))
+                last_id = entries[-1][0]
+                await self._publish_stats()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Dashboard event feed failed, will retry: {e}")
+                await asyncio.sleep(1)
+
+    async def _pump_knowledge(self):
+        while True:
+            pubsub = get_async_redis(self.kb_service.redis_url).pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe("knowledge:invalidate")
+                while True:
+                    message = await pubsub.get_message(timeout=self.block_ms / 1000)
+                    if message is None:
+                        continue
+                    try:
+                        change = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        change = {"op": "bulk"}
+                    if change.get("op") == "usage":
+                        # Usage counters only; not worth a dashboard refresh
+                        continue
+                    data = {"op": change.get("op"), "id": change.get("id")}
+                    if change.get("entry"):
+                        data["entry"] = change["entry"]
+                    self.publish(format_event("knowledge", data))
+                    await self._publish_stats()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Dashboard knowledge feed failed, will retry: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.reset()
+
+    async def _publish_stats(self):
+        request_stats = await self.help_service.get_stats()
+        self.publish(format_event("stats", {
+            "pending": request_stats["pending"],
+            "resolved": request_stats["resolved"],
+            "knowledge_entries": await self.kb_service.count_entries(),
+        }))
@@ -0,0 +1,164 @@
+"""
+Conditional GET and rendered-page caching for the supervisor UI.
+
+Views decorated with ``PageCache.conditional`` get an ETag and Last-Modified
+built from the data versions they depend on (see data_version). A browser
+that already has the current version gets 304 without the view running; a
+different tab asking for the same URL at the same version gets the rendered
+body from memory. Either way Redis is only asked for the versions, and at
+most once per ``version_ttl`` seconds.
+
+Each worker process has its own PageCache (see ``init_app``); the versions
+live in Redis, so every worker sees the same ETags for the same data.
+"""
+
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import Response, current_app, make_response, request
+
+from data_version import read_versions
+from redis_pool import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+class PageCache:
+    """LRU of rendered responses keyed by URL, valid while the data versions match."""
+
+    def __init__(self, run_async, redis_url: str = None, max_size: int = 256, version_ttl: float = 1.0):
+        self._run_async = run_async
+        self.redis_url = redis_url
+        self.max_size = max_size
+        # Pages may lag a write by this long; keeps version reads off the hot path
+        self.version_ttl = version_ttl
+        self._lock = threading.Lock()
+        self._pages = OrderedDict()
+        self._versions = None
+        self._versions_read_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def init_app(self, app):
+        app.extensions["page_cache"] = self
+        app.after_request(self._expire_after_write)
+
+    def versions(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            if self._versions is not None and now - self._versions_read_at < self.version_ttl:
+                return self._versions
+        versions = self._run_async(self._read_versions())
+        with self._lock:
+            self._versions, self._versions_read_at = versions, now
+        return versions
+
+    def expire_versions(self):
+        """Re-read the versions on the next request, e.g. after a write made by this process."""
+        with self._lock:
+            self._versions = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pages": len(self._pages),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+            }
+
+    def conditional(self, *scopes: str):
+        """Decorate a GET view whose output depends only on the data in ``scopes``."""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                return self.serve(scopes, view, *args, **kwargs)
+            return wrapper
+        return decorator
+
+    def serve(self, scopes, view, *args, **kwargs):
+        """Answer the current request from the cache, or run ``view`` and keep its response."""
+        try:
+            versions = self.versions()
+        except Exception as e:
+            logger.warning(f"Could not read data versions, serving {request.path} uncached: {e}")
+            return view(*args, **kwargs)
+
+        etag = ".".join(f"{scope[0]}{versions[scope]['version']}" for scope in scopes)
+        modified_at = max(versions[scope]["at"] for scope in scopes)
+        last_modified = datetime.fromtimestamp(int(modified_at), timezone.utc) if modified_at else None
+
+        if self._is_fresh(etag, last_modified):
+            with self._lock:
+                self.not_modified += 1
+            response = Response(status=304)
+        else:
+            response = self._cached_response(request.full_path, etag)
+            if response is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                self._store(request.full_path, etag, response)
+
+        response.set_etag(etag, weak=True)
+        if last_modified:
+            response.last_modified = last_modified
+        # Let the browser keep the page, but revalidate on every use
+        response.cache_control.no_cache = True
+        return response
+
+    def _expire_after_write(self, response):
+        # A supervisor redirected after a write must not get the cached page from before it
+        if request.method not in ("GET", "HEAD"):
+            self.expire_versions()
+        return response
+
+    async def _read_versions(self):
+        return await read_versions(get_async_redis(self.redis_url))
+
+    @staticmethod
+    def _is_fresh(etag: str, last_modified) -> bool:
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(etag)
+        if request.if_modified_since and last_modified:
+            return last_modified <= request.if_modified_since
+        return False
+
+    def _cached_response(self, url: str, etag: str):
+        with self._lock:
+            cached = self._pages.get(url)
+            if cached is None or cached[0] != etag:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(url)
+            self.hits += 1
+        _, body, mimetype = cached
+        return Response(body, mimetype=mimetype)
+
+    def _store(self, url: str, etag: str, response):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._pages[url] = (etag, response.get_data(), response.mimetype)
+            self._pages.move_to_end(url)
+            while len(self._pages) > self.max_size:
+                self._pages.popitem(last=False)
+
+
+def conditional(*scopes: str):
+    """``PageCache.conditional`` for the PageCache of the current app, for views defined before it exists."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            page_cache = current_app.extensions.get("page_cache")
+            if page_cache is None:
+                return view(*args, **kwargs)
+            return page_cache.serve(scopes, view, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,12 @@
+"""
+WSGI entry point for serving the supervisor UI from several processes:
+
+    gunicorn -c gunicorn.conf.py supervisor_ui.wsgi:app
+
+Every worker imports this module itself, so each builds its own app and
+resources after the fork.
+"""
+
+from supervisor_ui.app import create_app
+
+app = create_app()
@@ -0,0 +1,58 @@
+"""
+Shared fixtures: the services on an in-memory fakeredis server.
+
+Each test drives the async services through ``asyncio.run``, so every test
+gets a fresh event loop and a fresh Redis.
+"""
+
+import pytest
+from fakeredis import FakeRedis, FakeServer, aioredis as fake_aioredis
+
+import help_requests.events
+import help_requests.service
+import knowledge_base.service
+import supervisor_ui.page_cache
+from help_requests.archive import HelpRequestArchive
+from help_requests.service import HelpRequestService
+from knowledge_base.service import KnowledgeBaseService
+from search_index import SearchIndex
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    server = FakeServer()
+
+    def get_async_redis(url=None):
+        return fake_aioredis.FakeRedis(server=server, decode_responses=True)
+
+    def get_redis(url=None):
+        return FakeRedis(server=server, decode_responses=True)
+
+    monkeypatch.setattr(help_requests.service, "get_async_redis", get_async_redis)
+    monkeypatch.setattr(help_requests.events, "get_async_redis", get_async_redis)
+    monkeypatch.setattr(knowledge_base.service, "get_async_redis", get_async_redis)
+    monkeypatch.setattr(knowledge_base.service, "get_redis", get_redis)
+    monkeypatch.setattr(supervisor_ui.page_cache, "get_async_redis", get_async_redis)
+    return server
+
+
+@pytest.fixture
+def search_index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return HelpRequestArchive(str(tmp_path / "archive.db"))
+
+
+@pytest.fixture
+def help_service(redis_server, archive, search_index):
+    return HelpRequestService(archive=archive, search=search_index)
+
+
+@pytest.fixture
+def kb_service(redis_server, search_index):
+    return KnowledgeBaseService(search=search_index)
@@ -0,0 +1,47 @@
+import asyncio
+
+from help_requests.events import EventConsumer, read_events
+
+
+def test_transitions_are_logged_in_order(help_service):
+    async def scenario():
+        help_request = await help_service.create_help_request('+1 555 000 0001', 'do you do balayage')
+        await help_service.mark_request_unresolved(help_request.id)
+        await help_service.resolve_request(help_request.id, 'yes')
+
+        events = await read_events()
+        assert [fields['type'] for _, fields in events] == ['created', 'unresolved', 'resolved']
+        assert {fields['request_id'] for _, fields in events} == {help_request.id}
+        # Resuming after an id returns only what came later
+        assert [fields['type'] for _, fields in await read_events(events[0][0])] == ['unresolved', 'resolved']
+
+    asyncio.run(scenario())
+
+
+def test_consumer_delivers_at_least_once_and_replays(help_service):
+    async def scenario():
+        handled = []
+        failing = {'once': True}
+
+        async def handler(event_id, fields):
+            if fields['type'] == 'resolved' and failing.pop('once', False):
+                raise RuntimeError('notifier down')
+            handled.append(fields['type'])
+
+        consumer = EventConsumer('test', handler, start_id='0', block_ms=10, claim_idle_ms=0)
+        await consumer.ensure_group()
+        help_request = await help_service.create_help_request('+1 555 000 0001', 'do you do balayage')
+        await help_service.resolve_request(help_request.id, 'yes')
+
+        assert await consumer.process_once() == 1
+        assert handled == ['created']
+        # The failed event stayed pending and is reclaimed on the next pass
+        assert await consumer.process_once() == 1
+        assert handled == ['created', 'resolved']
+        assert await consumer.process_once() == 0
+
+        await consumer.replay_from('0')
+        assert await consumer.process_once() == 2
+        assert handled == ['created', 'resolved', 'created', 'resolved']
+
+    asyncio.run(scenario())
@@ -0,0 +1,251 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from help_requests.models import HelpRequest, RequestStatus, StatusConflict
+
+
+def test_timed_out_request_does_not_collect_new_callers(help_service):
+    async def scenario():
+        first = await help_service.create_help_request('+1 555 000 0001', 'Do you offer keratin?')
+        later = datetime.utcnow() + timedelta(minutes=first.timeout_minutes + 1)
+        assert await help_service.sweep_timeouts(now=later) == 1
+
+        second = await help_service.create_help_request('+1 555 000 0002', 'do you offer keratin')
+        assert not second.joined
+        assert second.id != first.id
+        assert second.status == RequestStatus.PENDING
+
+        # A late answer to the timed-out request only goes to its own caller
+        resolved = await help_service.resolve_request(first.id, 'Yes, we do')
+        assert resolved.subscribers == []
+        assert (await help_service.get_help_request(second.id)).status == RequestStatus.PENDING
+
+    asyncio.run(scenario())
+
+
+def test_stale_claim_is_taken_over(help_service):
+    async def scenario():
+        first = await help_service.create_help_request('+1 555 000 0001', 'Are you open Sunday?')
+        # A claim left behind by a request that timed out before claims were released
+        first.mark_timeout()
+        await help_service.update_help_request(first, previous_status=RequestStatus.PENDING)
+        await help_service.redis.set(help_service._open_question_key(first.question), first.id)
+
+        second = await help_service.create_help_request('+1 555 000 0002', 'Are you open Sunday?')
+        assert not second.joined
+        assert await help_service.get_subscribers(first.id) == []
+
+        third = await help_service.create_help_request('+1 555 000 0003', 'are you open sunday')
+        assert third.joined and third.id == second.id
+
+    asyncio.run(scenario())
+
+
+def test_second_resolve_raises_status_conflict(help_service):
+    async def scenario():
+        help_request = await help_service.create_help_request('+1 555 000 0001', 'Do you sell gift cards?')
+        await help_service.resolve_request(help_request.id, 'Yes')
+        with pytest.raises(StatusConflict):
+            await help_service.resolve_request(help_request.id, 'No')
+
+        stored = await help_service.get_help_request(help_request.id)
+        assert stored.supervisor_answer == 'Yes'
+        assert (await help_service.get_stats())['resolved'] == 1
+
+    asyncio.run(scenario())
+
+
+def test_resolve_racing_timeout_sweep_keeps_answer_and_counts(help_service):
+    async def scenario():
+        requests = [
+            await help_service.create_help_request(f'+1 555 000 00{i:02d}', f'question {i}')
+            for i in range(20)
+        ]
+        later = datetime.utcnow() + timedelta(minutes=requests[0].timeout_minutes + 1)
+        await asyncio.gather(
+            help_service.sweep_timeouts(batch_size=5, now=later),
+            *(help_service.resolve_request(help_request.id, 'answer') for help_request in requests),
+        )
+
+        for stored in await help_service.get_help_requests([help_request.id for help_request in requests]):
+            assert stored.status == RequestStatus.RESOLVED
+            assert stored.supervisor_answer == 'answer'
+        stats = await help_service.get_stats()
+        assert stats['resolved'] == 20
+        assert stats['timeout'] == 0
+        assert stats['pending'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_resolve_many_with_mixed_statuses_and_duplicates(help_service):
+    async def scenario():
+        pending = await help_service.create_help_request('+1 555 000 0001', 'question a')
+        answered = await help_service.create_help_request('+1 555 000 0002', 'question b')
+        unresolved = await help_service.create_help_request('+1 555 000 0003', 'question c')
+        await help_service.resolve_request(answered.id, 'first answer')
+        await help_service.mark_request_unresolved(unresolved.id)
+
+        resolved, missing, conflicts = await help_service.resolve_many(
+            [pending.id, answered.id, pending.id, 'no-such-id', unresolved.id, answered.id], 'batch answer'
+        )
+        assert [help_request.id for help_request in resolved] == [pending.id, unresolved.id]
+        assert missing == ['no-such-id']
+        assert [help_request.id for help_request in conflicts] == [answered.id]
+
+        assert (await help_service.get_help_request(answered.id)).supervisor_answer == 'first answer'
+        stats = await help_service.get_stats()
+        assert stats['resolved'] == 3
+        assert stats['unresolved'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_mark_many_unresolved_skips_resolved(help_service):
+    async def scenario():
+        pending = await help_service.create_help_request('+1 555 000 0001', 'question a')
+        answered = await help_service.create_help_request('+1 555 000 0002', 'question b')
+        await help_service.resolve_request(answered.id, 'answer')
+
+        updated, missing, conflicts = await help_service.mark_many_unresolved([pending.id, answered.id])
+        assert [help_request.id for help_request in updated] == [pending.id]
+        assert missing == []
+        assert [help_request.id for help_request in conflicts] == [answered.id]
+
+        stored = await help_service.get_help_request(answered.id)
+        assert stored.status == RequestStatus.RESOLVED
+        assert stored.supervisor_answer == 'answer'
+
+    asyncio.run(scenario())
+
+
+def _resolved_at(number: int, resolved_at: datetime) -> HelpRequest:
+    help_request = HelpRequest(customer_phone=f'+1 555 000 {number:04d}', question=f'question {number}')
+    help_request.resolve('answer')
+    help_request.resolved_at = resolved_at
+    return help_request
+
+
+async def _page_through_resolved(help_service, limit):
+    request_ids = []
+    cursor = None
+    while True:
+        page, cursor = await help_service.list_resolved(limit=limit, cursor=cursor)
+        request_ids.extend(help_request.id for help_request in page)
+        if cursor is None:
+            return request_ids
+        assert len(request_ids) < 100, 'cursor is not advancing'
+
+
+def test_resolved_pages_continue_from_redis_into_archive(help_service, archive):
+    async def scenario():
+        base = datetime(2026, 1, 1, 12, 0)
+        recent = [_resolved_at(i, base - timedelta(minutes=i)) for i in range(3)]
+        older = [_resolved_at(i, base - timedelta(minutes=i)) for i in range(3, 7)]
+        for help_request in recent:
+            await help_service.update_help_request(help_request)
+        archive.store(older)
+
+        for limit in (1, 2, 3, 4, 10):
+            assert await _page_through_resolved(help_service, limit) == [r.id for r in recent + older]
+
+    asyncio.run(scenario())
+
+
+def test_resolved_pages_keep_ties_at_the_boundary(help_service, archive):
+    async def scenario():
+        tie = datetime(2026, 1, 1, 12, 0)
+        in_redis = [_resolved_at(i, tie) for i in range(5)]
+        in_archive = [_resolved_at(i, tie) for i in range(5, 8)] + [_resolved_at(8, tie - timedelta(minutes=1))]
+        for help_request in in_redis:
+            await help_service.update_help_request(help_request)
+        archive.store(in_archive)
+
+        expected = {help_request.id for help_request in in_redis + in_archive}
+        for limit in (1, 2, 3, 5, 6):
+            request_ids = await _page_through_resolved(help_service, limit)
+            assert len(request_ids) == len(expected)
+            assert set(request_ids) == expected
+            assert request_ids[-1] == in_archive[-1].id
+
+    asyncio.run(scenario())
+
+
+def test_pending_pages_keep_tied_requests(help_service):
+    async def scenario():
+        created = [await help_service.create_help_request(f'+1 555 000 {i:04d}', f'question {i}') for i in range(5)]
+        # Callers arriving within the same clock tick share a score
+        await help_service.redis.zadd('help_requests:queue', {help_request.id: 1e9 for help_request in created})
+        await help_service.redis.zadd('help_requests:queue', {created[0].id: 1e9 - 1})
+
+        request_ids, cursor = [], None
+        while True:
+            page, cursor = await help_service.list_pending(limit=2, cursor=cursor)
+            request_ids.extend(help_request.id for help_request in page)
+            if cursor is None:
+                break
+        assert len(request_ids) == 5
+        assert set(request_ids) == {help_request.id for help_request in created}
+        assert request_ids[-1] == created[0].id
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize('cursor', ['abc', 'nan:x', 'inf', ':id'])
+def test_malformed_cursors_raise_value_error(help_service, cursor):
+    async def scenario():
+        with pytest.raises(ValueError):
+            await help_service.list_pending(cursor=cursor)
+        with pytest.raises(ValueError):
+            await help_service.list_resolved(cursor=cursor)
+
+    asyncio.run(scenario())
+
+
+def test_customer_history_spans_redis_and_archive(help_service, archive):
+    async def scenario():
+        live = await help_service.create_help_request('+1 (555) 000-0001', 'do you do balayage')
+        other = await help_service.create_help_request('+1 555 000 0002', 'are you open sundays')
+        older = _resolved_at(1, datetime(2026, 1, 1, 12, 0))
+        older.created_at = datetime(2026, 1, 1, 11, 0)
+        archive.store([older])
+
+        # Formatting differs between calls; the index is keyed by digits only
+        history = await help_service.get_requests_for_customer('15550000001')
+        assert [help_request.id for help_request in history] == [live.id, older.id]
+        assert other.id not in {help_request.id for help_request in history}
+        assert await help_service.get_requests_for_customer('') == []
+
+    asyncio.run(scenario())
+
+
+def test_migrate_pending_moves_the_legacy_list_into_the_queue(help_service):
+    async def scenario():
+        first = await help_service.create_help_request('+1 555 000 0001', 'question a')
+        second = await help_service.create_help_request('+1 555 000 0002', 'question b')
+        answered = await help_service.create_help_request('+1 555 000 0003', 'question c')
+        await help_service.resolve_request(answered.id, 'answer')
+
+        # What an older version left behind: a plain list, with repeats and dead ids
+        redis = help_service.redis
+        await redis.delete('help_requests:queue', 'help_requests:deadlines')
+        await redis.rpush('help_requests:pending', first.id, second.id, first.id, answered.id, 'expired-id')
+
+        assert await help_service.migrate_pending_list() == 2
+        assert not await redis.exists('help_requests:pending')
+        queue = dict(await redis.zrange('help_requests:queue', 0, -1, withscores=True))
+        # Re-scored by created_at, like requests queued by create_help_request
+        assert queue == {
+            first.id: help_service._timestamp(first.created_at),
+            second.id: help_service._timestamp(second.created_at),
+        }
+        assert await redis.zcard('help_requests:deadlines') == 2
+        assert (await help_service.get_stats())['pending'] == 2
+
+        # Safe to re-run
+        assert await help_service.migrate_pending_list() == 0
+        assert await redis.zcard('help_requests:queue') == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fakeredis import FakeRedis
+
+
+def test_export_reimports_unchanged(kb_service):
+    async def scenario():
+        await kb_service.add_entries([
+            ('Do you do "balayage" & ombre?', "Yes <b>both</b>, it's $150+"),
+            ('What are your hours', 'Mon-Fri 9-7'),
+        ], source='supervisor')
+        exported = [entry async for entry in kb_service.export_entries()]
+        # Questions are stored lowercased; the export keeps them that way
+        assert {entry['question'] for entry in exported} == {'do you do "balayage" & ombre?', 'what are your hours'}
+        assert "Yes <b>both</b>, it's $150+" in {entry['answer'] for entry in exported}
+
+        counts = await kb_service.add_entries(exported)
+        assert counts == {'added': 0, 'updated': 0, 'unchanged': 2}
+        assert await kb_service.count_entries() == 2
+
+    asyncio.run(scenario())
+
+
+def test_find_answer_matches_questions_with_markup_characters(kb_service):
+    async def scenario():
+        await kb_service.add_entry('Do you do "balayage" & ombre?', 'Yes, both')
+        assert await kb_service.find_answer('  do you do "Balayage" & Ombre? ') == 'Yes, both'
+        assert await kb_service.find_answer('do you do balayage') is None
+
+    asyncio.run(scenario())
+
+
+def test_rebuild_restores_the_question_index(kb_service, redis_server):
+    async def scenario():
+        await kb_service.add_entries([("What are your hours", "Mon-Fri 9-7"), ("Can I bring my dog?", "Yes")])
+        redis = FakeRedis(server=redis_server, decode_responses=True)
+        redis.delete("knowledge:question_index", "knowledge:index", "knowledge:created", "knowledge:last_used")
+        kb_service._invalidate_cache()
+        assert await kb_service.find_answer("What are your hours") is None
+
+        assert await kb_service.rebuild_indexes() == 2
+        assert await kb_service.find_answer("What are your hours") == "Mon-Fri 9-7"
+        assert await kb_service.find_answer("can i bring my dog?") == "Yes"
+        assert await kb_service.count_entries() == 2
+        entries, _ = await kb_service.list_entries(order="created_at")
+        assert len(entries) == 2
+
+    asyncio.run(scenario())
+
+
+def test_usage_flush_refreshes_cached_listing(kb_service):
+    async def scenario():
+        entry = await kb_service.add_entry('What are your hours', 'Mon-Fri 9-7')
+        entries, _ = await kb_service.list_entries()
+        assert entries[0].usage_count == 0
+
+        await kb_service.record_usage(entry.id)
+        assert kb_service.usage.flush() == 1
+        entries, _ = await kb_service.list_entries()
+        assert entries[0].usage_count == 1
+
+    asyncio.run(scenario())
+
+
+def test_usage_invalidation_keeps_cached_answers(kb_service):
+    kb_service.cache.set(("answer", "what are your hours"), {"id": "1", "answer": "Mon-Fri 9-7"})
+    kb_service.cache.set(("list", "last_used", None, 20), ([], None))
+    kb_service.cache.set(("all",), [])
+
+    kb_service._on_invalidate({"data": json.dumps({"op": "usage"})})
+    assert list(kb_service.cache._data) == [("answer", "what are your hours")]
+
+    kb_service._on_invalidate({"data": json.dumps({"op": "delete", "id": "1"})})
+    assert len(kb_service.cache) == 0
+
+
+def test_listing_pages_through_tied_scores(kb_service, redis_server):
+    async def scenario():
+        await kb_service.add_entries([(f"question {i}", "answer") for i in range(7)], source="supervisor")
+        # Entries imported together can share a created_at
+        redis = FakeRedis(server=redis_server, decode_responses=True)
+        redis.zadd("knowledge:created", {entry_id: 1.0 for entry_id in redis.zrange("knowledge:created", 0, -1)})
+
+        seen, cursor = [], None
+        while True:
+            entries, cursor = await kb_service.list_entries(limit=3, order="created_at", cursor=cursor)
+            seen.extend(entry.question for entry in entries)
+            if cursor is None:
+                break
+        assert sorted(seen) == [f"question {i}" for i in range(7)]
+
+    asyncio.run(scenario())
+
+
+def test_listing_rejects_a_malformed_cursor(kb_service):
+    async def scenario():
+        with pytest.raises(ValueError):
+            await kb_service.list_entries(cursor="not-a-cursor")
+
+    asyncio.run(scenario())
+
+
+def _published(pubsub, count, timeout=2.0):
+    """The next ``count`` messages on the channel, waiting up to ``timeout`` seconds."""
+    messages = []
+    deadline = time.monotonic() + timeout
+    while len(messages) < count and time.monotonic() < deadline:
+        message = pubsub.get_message(ignore_subscribe_messages=True, timeout=0.1)
+        if message is not None:
+            messages.append(json.loads(message["data"]))
+    return messages
+
+
+def test_small_batches_invalidate_entry_by_entry(kb_service, redis_server):
+    pubsub = FakeRedis(server=redis_server, decode_responses=True).pubsub()
+    pubsub.subscribe("knowledge:invalidate")
+
+    async def scenario():
+        await kb_service.add_entries([(f"question {i}", "answer") for i in range(3)], source="supervisor")
+        messages = _published(pubsub, 3)
+        assert [message["op"] for message in messages] == ["add"] * 3
+        assert {message["entry"]["question"] for message in messages} == {"question 0", "question 1", "question 2"}
+
+        size = kb_service.MAX_ENTRY_INVALIDATIONS + 1
+        await kb_service.add_entries([(f"bulk {i}", "answer") for i in range(size)])
+        assert _published(pubsub, 1) == [{"op": "bulk"}]
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from flask import Flask
+
+from data_version import HELP_REQUESTS
+from supervisor_ui.page_cache import PageCache, conditional
+
+
+@pytest.fixture
+def client_and_calls(redis_server):
+    calls = []
+    app = Flask(__name__)
+    page_cache = PageCache(asyncio.run, version_ttl=0)
+    page_cache.init_app(app)
+
+    @app.route('/requests')
+    @conditional(HELP_REQUESTS)
+    def requests_page():
+        calls.append(1)
+        return f'render {len(calls)}'
+
+    return app.test_client(), calls
+
+
+def test_matching_etag_gets_304_without_rendering(client_and_calls):
+    client, calls = client_and_calls
+    first = client.get('/requests')
+    assert first.status_code == 200 and first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    again = client.get('/requests', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+    # Another tab without the ETag gets the rendered body from memory
+    other_tab = client.get('/requests')
+    assert other_tab.get_data(as_text=True) == 'render 1'
+    assert len(calls) == 1
+
+
+def test_write_bumps_the_version_and_the_page_renders_again(client_and_calls, help_service):
+    client, calls = client_and_calls
+    etag = client.get('/requests').headers['ETag']
+
+    asyncio.run(help_service.create_help_request('+1 555 000 0001', 'do you do balayage'))
+
+    after_write = client.get('/requests', headers={'If-None-Match': etag})
+    assert after_write.status_code == 200
+    assert after_write.get_data(as_text=True) == 'render 2'
+    assert after_write.headers['ETag'] != etag
+    assert client.get('/requests', headers={'If-None-Match': after_write.headers['ETag']}).status_code == 304
+
+
+def test_a_write_from_this_worker_skips_the_version_ttl(redis_server, help_service):
+    app = Flask(__name__)
+    PageCache(asyncio.run, version_ttl=60).init_app(app)
+
+    @app.route('/requests')
+    @conditional(HELP_REQUESTS)
+    def requests_page():
+        return 'page'
+
+    @app.route('/resolve', methods=['POST'])
+    def resolve():
+        asyncio.run(help_service.create_help_request('+1 555 000 0001', 'do you do balayage'))
+        return ''
+
+    client = app.test_client()
+    etag = client.get('/requests').headers['ETag']
+    client.post('/resolve')
+    # The redirect after a write must not be answered from the old version
+    assert client.get('/requests', headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,57 @@
+import asyncio
+
+from knowledge_base.matcher import QuestionMatcher
+
+
+def _matcher():
+    matcher = QuestionMatcher()
+    matcher.add("hours", "what are your opening hours")
+    matcher.add("balayage", "do you do balayage highlights")
+    matcher.add("parking", "is there parking near the salon")
+    matcher.add("price", "how much is a haircut")
+    return matcher
+
+
+def test_rewordings_and_typos_rank_the_right_question_first():
+    matcher = _matcher()
+    [(doc_id, score)] = matcher.search("what are your opening hours", k=1)
+    # Same wording: near 1 (queries are IDF-weighted, stored questions are not)
+    assert doc_id == "hours" and score > 0.95
+
+    results = matcher.search("Do you do balyage highlight?", k=3)
+    assert results[0][0] == "balayage"
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+    assert all(results[0][1] > score for _, score in results[1:])
+
+
+def test_min_score_and_k_bound_the_results():
+    matcher = _matcher()
+    assert matcher.search("can I bring my dog", k=3, min_score=0.6) == []
+    assert len(matcher.search("what are your hours for a haircut", k=1)) == 1
+
+    scores = dict(matcher.search("what are your hours", k=4))
+    assert scores["hours"] >= 0.6
+    above = matcher.search("what are your hours", k=4, min_score=scores["hours"])
+    assert [doc_id for doc_id, _ in above] == ["hours"]
+
+
+def test_removed_and_replaced_questions_stop_matching():
+    matcher = _matcher()
+    assert matcher.remove("parking")
+    assert not matcher.remove("parking")
+    assert all(doc_id != "parking" for doc_id, _ in matcher.search("is there parking", k=4))
+
+    matcher.add("hours", "are you open on sundays")
+    assert matcher.search("are you open on sundays", k=1)[0][0] == "hours"
+    assert matcher.search("what are your opening hours", k=1, min_score=0.6) == []
+    assert len(matcher) == 3
+
+
+def test_find_best_answers_applies_the_threshold(kb_service):
+    async def scenario():
+        await kb_service.add_entries([("What are your opening hours", "Mon-Fri 9-7"), ("How much is a haircut", "$40")])
+        [(entry, score)] = await kb_service.find_best_answers("what are your openning hours?", k=1, min_score=0.6)
+        assert entry.answer == "Mon-Fri 9-7" and score >= 0.6
+        assert await kb_service.find_best_answers("can I bring my dog", min_score=0.6) == []
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import asyncio
+
+from search_index import HELP_REQUEST, KNOWLEDGE
+
+
+def test_services_index_their_writes(help_service, kb_service, search_index):
+    async def scenario():
+        await kb_service.add_entry('Do you do balayage & ombre?', 'Yes, <b>both</b>')
+        help_request = await help_service.create_help_request('+1 555 000 0001', 'Can I book balayage on Sunday?')
+
+        hits, _ = search_index.search('balayage')
+        assert {(hit['kind'], hit['status']) for hit in hits} == {(KNOWLEDGE, 'supervisor'), (HELP_REQUEST, 'pending')}
+        # Stored text is escaped by the services; the index holds it plain
+        [knowledge_hit] = [hit for hit in hits if hit['kind'] == KNOWLEDGE]
+        assert knowledge_hit['question'] == 'do you do balayage & ombre?'
+        assert knowledge_hit['answer'] == 'Yes, <b>both</b>'
+
+        await help_service.resolve_request(help_request.id, 'Yes, from 10am')
+        hits, _ = search_index.search('10am', kind=HELP_REQUEST)
+        assert [(hit['id'], hit['status']) for hit in hits] == [(help_request.id, 'resolved')]
+
+        await kb_service.delete_entry(knowledge_hit['id'])
+        assert search_index.search('ombre')[0] == []
+
+    asyncio.run(scenario())
+
+
+def test_ranking_prefix_and_paging(search_index):
+    search_index.index(KNOWLEDGE, [
+        ('hours', 'what are your opening hours', 'Mon-Fri 9-7', 'import'),
+        ('late', 'are you open late', 'Until 7pm; opening hours are on the website', 'import'),
+        ('dogs', 'can I bring my dog', 'Yes', 'import'),
+    ])
+    hits, next_offset = search_index.search('opening hours')
+    # A question match weighs more than the same words in an answer
+    assert [hit['id'] for hit in hits] == ['hours', 'late']
+    assert next_offset is None
+
+    # The last word matches as a prefix, so results follow typing
+    assert [hit['id'] for hit in search_index.search('bring my d')[0]] == ['dogs']
+
+    page, next_offset = search_index.search('open', limit=1)
+    assert len(page) == 1 and next_offset == 1
+    rest, next_offset = search_index.search('open', offset=next_offset, limit=1)
+    assert {page[0]['id'], rest[0]['id']} == {'hours', 'late'} and next_offset is None
+
+
+def test_query_operators_are_treated_as_words(search_index):
+    search_index.index(KNOWLEDGE, [('hours', 'what are your hours', 'Mon-Fri 9-7', 'import')])
+    assert [hit['id'] for hit in search_index.search('what: "are" your-hours*')[0]] == ['hours']
+    # FTS5 syntax typed into the box is searched for, not parsed
+    assert search_index.search('NEAR(hours') == ([], None)
+    assert search_index.search('"') == ([], None)